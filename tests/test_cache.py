@@ -0,0 +1,89 @@
+import multiprocessing
+import pickle
+import time
+
+from core.cache import FileBasedCache, TwoTierCache
+
+
+def two_tier(location, shared_location, **options):
+    return TwoTierCache(location, {'OPTIONS': {
+        'SHARED': {
+            'BACKEND': 'core.cache.FileBasedCache',
+            'LOCATION': shared_location,
+        },
+        **options,
+    }})
+
+
+def increment(location, times):
+    cache = FileBasedCache(location, {})
+    for _ in range(times):
+        cache.incr('version:index')
+
+
+class TestTwoTierCache:
+
+    def test_incr_is_atomic_between_processes(self, tmp_path):
+        FileBasedCache(str(tmp_path), {}).set('version:index', 0)
+        workers = [
+            multiprocessing.Process(target=increment,
+                                    args=(str(tmp_path), 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert FileBasedCache(str(tmp_path), {}).get('version:index') == 200, (
+            'Проверьте, что одновременные incr из разных процессов '
+            'не теряют увеличения версии'
+        )
+
+    def test_incr_keeps_expiry(self, tmp_path):
+        cache = FileBasedCache(str(tmp_path), {})
+
+        def expiry(key):
+            with open(cache._key_to_file(key), 'rb') as f:
+                return pickle.load(f)
+
+        cache.add('version:index', 1, None)
+        cache.set('changed:index', 1, 60)
+        assert cache.incr('version:index') == 2
+        cache.incr('changed:index')
+        assert expiry('version:index') is None, (
+            'Проверьте, что incr не ставит срок ключам без срока'
+        )
+        assert time.time() < expiry('changed:index') <= time.time() + 60, (
+            'Проверьте, что incr сохраняет срок ключа'
+        )
+
+    def test_versions_are_shared_between_processes(self, tmp_path):
+        # Два экземпляра с разными LRU — как два воркера.
+        first = two_tier('first', str(tmp_path))
+        second = two_tier('second', str(tmp_path))
+        first.set('version:index', 1)
+        first.set('fragment:1', 'старый')
+        assert second.get('fragment:1') == 'старый', (
+            'Проверьте, что значения читаются из общего кэша'
+        )
+        first.incr('version:index')
+        assert second.get('version:index') == 2, (
+            'Проверьте, что ключи `version:` не кэшируются в процессе'
+        )
+        first.shared.delete('fragment:1')
+        assert second.get('fragment:1') == 'старый', (
+            'Проверьте, что горячие ключи отдаются из LRU процесса'
+        )
+
+    def test_local_tier_evicts_by_size(self, tmp_path):
+        cache = two_tier('small', str(tmp_path), LOCAL_MAX_BYTES=300)
+        cache.set('a', 'x' * 100)
+        cache.set('b', 'x' * 100)
+        cache.get('a')
+        cache.set('c', 'x' * 100)
+        assert set(cache.local.entries) == {
+            cache.make_key('a'), cache.make_key('c')}, (
+            'Проверьте, что LRU вытесняет давно не читанные ключи'
+        )
+        assert cache.local.size <= 300
+        assert cache.get('b') == 'x' * 100
@@ -0,0 +1,53 @@
+import pytest
+
+from core.metrics import collect, registry, template_timer
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestMetrics:
+
+    def test_metrics_by_view(self, client, admin_client, post, settings):
+        settings.DEBUG = True
+        registry.reset()
+        response = client.get(f'/posts/{post.id}/')
+        server_timing = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            assert metric in server_timing, (
+                'Проверьте, что в режиме DEBUG ответ содержит `Server-Timing`'
+            )
+        content = admin_client.get('/metrics/').content.decode()
+        for line in (
+                '# TYPE yatube_request_duration_seconds histogram',
+                'yatube_request_duration_seconds_count'
+                '{view="posts:post_detail"} 1',
+                'yatube_db_queries_bucket{view="posts:post_detail",le="+Inf"} 1',
+                'yatube_template_duration_seconds_count'
+                '{view="posts:post_detail"} 1',
+                'yatube_cache_misses_total{view="posts:post_detail"}',
+        ):
+            assert line in content, (
+                f'Проверьте, что `/metrics/` отдаёт `{line}`'
+            )
+
+    def test_metrics_are_protected(self, client, settings):
+        assert client.get('/metrics/').status_code == 403, (
+            'Проверьте, что метрики не видны гостям'
+        )
+        settings.METRICS_TOKEN = 'secret'
+        response = client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+        assert response.status_code == 200, (
+            'Проверьте, что метрики отдаются по токену `METRICS_TOKEN`'
+        )
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+
+    def test_nested_templates_timed_once(self, monkeypatch):
+        ticks = iter(range(10))
+        monkeypatch.setattr('core.metrics.perf_counter', lambda: next(ticks))
+        with collect() as stats:
+            with template_timer():
+                with template_timer():
+                    pass
+        assert stats.template_time == 1, (
+            'Проверьте, что вложенный рендеринг не считается дважды'
+        )
@@ -0,0 +1,53 @@
+import pytest
+
+from posts.models import Post
+
+pytestmark = [pytest.mark.django_db]
+
+# Группа, профиль и пост делают ещё один индексный запрос для ETag.
+QUERY_BUDGET = {
+    '/': 4,
+    '/?page=2': 4,
+    '/group/{group}/': 6,
+    '/profile/{author}/': 7,
+    '/posts/{post}/': 5,
+    '/follow/': 4,
+}
+
+
+def render_without_fragments(client, url):
+    """Прогреваем миниатюры, затем сбрасываем кэш карточек и лент."""
+    client.get(url)
+    for post in Post.objects.all():
+        post.save()
+
+
+class TestQueryBudget:
+
+    @pytest.mark.parametrize('url_template', QUERY_BUDGET)
+    def test_view_query_budget(self, user_client, few_posts_with_group,
+                               another_few_posts_with_group_with_follower,
+                               django_assert_max_num_queries, url_template):
+        url = url_template.format(
+            group=few_posts_with_group.group.slug,
+            author=few_posts_with_group.author.username,
+            post=few_posts_with_group.id,
+        )
+        render_without_fragments(user_client, url)
+        with django_assert_max_num_queries(QUERY_BUDGET[url_template]):
+            response = user_client.get(url)
+        assert response.status_code == 200, (
+            f'Страница `{url}` работает неправильно'
+        )
+
+    def test_query_count_does_not_depend_on_page_size(
+            self, client, mixer, user, group,
+            django_assert_max_num_queries):
+        mixer.cycle(3).blend(Post, author=user, group=group, image='')
+        render_without_fragments(client, '/')
+        with django_assert_max_num_queries(2):
+            client.get('/')
+        mixer.cycle(7).blend(Post, author=user, group=group, image='')
+        render_without_fragments(client, '/')
+        with django_assert_max_num_queries(2):
+            client.get('/')
@@ -0,0 +1,131 @@
+import sqlite3
+import time
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from core.middleware import PRIMARY_COOKIE, ReplicaMiddleware
+from core.routers import (
+    ReplicaRouter, reads_current, replica_reads, replica_synced,
+    replica_synced_at, watch_writes,
+)
+from posts.cache import bump_version
+from posts.models import Post
+
+
+class TestReplicaRouting:
+
+    def test_router(self, settings):
+        settings.REPLICA_DATABASES = ['replica']
+        router = ReplicaRouter()
+        assert router.db_for_read(Post) is None
+        with replica_reads():
+            assert router.db_for_read(Post) == 'replica', (
+                'Проверьте, что чтения в режиме реплики идут на реплику'
+            )
+            assert router.db_for_write(Post) == 'default'
+            for model in (Session, User):
+                assert router.db_for_read(model) == 'default', (
+                    'Проверьте, что сессии и пользователи читаются '
+                    'с основной базы'
+                )
+        assert router.db_for_read(Post) is None
+
+    def test_writes_are_watched(self):
+        router = ReplicaRouter()
+        with watch_writes() as writes:
+            router.db_for_write(Session)
+            assert not writes.wrote
+            router.db_for_write(Post)
+        assert writes.wrote, 'Проверьте, что роутер отмечает запись'
+
+    def test_replica_synced_after_changes(self):
+        cache.clear()
+        assert replica_synced_at() is None
+        synced = time.time()
+        replica_synced(synced)
+        assert replica_synced_at() == synced
+        bump_version('index')
+        assert replica_synced_at() is None, (
+            'Проверьте, что после смены версий отставшая реплика не читается'
+        )
+
+    def test_stale_replica_reads_not_cached(self, settings):
+        settings.REPLICA_DATABASES = ['replica']
+        cache.clear()
+        synced = time.time()
+        with replica_reads(synced):
+            assert reads_current()
+            bump_version('index')
+            assert not reads_current(), (
+                'Проверьте, что собранное по отставшей реплике '
+                'не кэшируется под новой версией'
+            )
+
+    def test_read_only_views_use_replica(self, settings):
+        settings.REPLICA_DATABASES = ['replica']
+        factory = RequestFactory()
+        sticky = factory.get('/')
+        sticky.COOKIES[PRIMARY_COOKIE] = '1'
+        for request, expected in (
+                (factory.get('/'), True),
+                (factory.get('/posts/1/'), True),
+                (factory.get('/create/'), False),
+                (factory.post('/'), False),
+                (sticky, False)):
+            assert ReplicaMiddleware.use_replica(request) is expected, (
+                f'Проверьте выбор базы для {request.method} {request.path}'
+            )
+
+    @pytest.mark.django_db
+    def test_write_sticks_to_primary(self, user_client):
+        response = user_client.post('/create/', {'text': 'Новый пост'})
+        assert PRIMARY_COOKIE in response.cookies, (
+            'Проверьте, что после записи пользователь читает с основной базы'
+        )
+        assert PRIMARY_COOKIE not in user_client.get('/').cookies
+
+    @pytest.mark.django_db
+    def test_get_follow_sticks_to_primary(self, user_client, another_user):
+        response = user_client.get(
+            f'/profile/{another_user.username}/follow/')
+        assert PRIMARY_COOKIE in response.cookies, (
+            'Проверьте, что cookie ставится после записи при GET-запросе'
+        )
+
+    @pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+    def test_reads_go_to_replica(self, settings, user_client, post):
+        settings.REPLICA_DATABASES = ['replica']
+        cache.clear()
+        with CaptureQueriesContext(connections['replica']) as replica:
+            user_client.get('/')
+        assert not replica, 'Реплика не скопирована: читать с неё нельзя'
+        replica_synced(time.time())
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = user_client.get('/')
+        assert response.status_code == 200
+        assert replica, 'Проверьте, что лента читается с реплики'
+        tables = ' '.join(query['sql'] for query in primary)
+        assert 'django_session' in tables and 'auth_user' in tables, (
+            'Проверьте, что сессия и пользователь читаются с основной базы'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_replicate(self, settings, tmp_path, post):
+        settings.REPLICA_PATH = str(tmp_path / 'replica.sqlite3')
+        call_command('replicate', stdout=StringIO())
+        replica = sqlite3.connect(settings.REPLICA_PATH)
+        try:
+            count = replica.execute(
+                'SELECT count(*) FROM posts_post').fetchone()[0]
+        finally:
+            replica.close()
+        assert count == 1, 'Проверьте, что replicate копирует базу'
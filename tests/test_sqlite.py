@@ -0,0 +1,28 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestSqliteTuning:
+
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            for pragma, expected in (('synchronous', 1), ('temp_store', 2),
+                                     ('cache_size', -64 * 1024)):
+                cursor.execute(f'PRAGMA {pragma}')
+                assert cursor.fetchone()[0] == expected, (
+                    f'Проверьте, что соединение настраивает `PRAGMA {pragma}`'
+                )
+
+    def test_sqlite_benchmark(self):
+        out = StringIO()
+        call_command('sqlite_benchmark', readers=2, writers=1, seconds=0.2,
+                     rows=100, stdout=out)
+        report = json.loads(out.getvalue())
+        assert set(report) == {'default', 'tuned'}
+        assert report['tuned']['writes_per_second'] > 0
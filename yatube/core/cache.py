@@ -0,0 +1,232 @@
+"""Бэкенды кэша: общий файловый и LRU процесса перед ним.
+
+``TwoTierCache`` держит перед общим для всех воркеров кэшем (файловым,
+memcached, redis) небольшой LRU в памяти процесса: горячие фрагменты
+отдаются без обращения к общему кэшу. Ключи ``version:`` и
+``changed:`` всегда читаются из общего кэша — в них записаны версии
+лент, а фрагменты ключуются этими версиями. Поэтому сигнал в одном
+воркере сбрасывает фрагменты во всех остальных: они просто начинают
+спрашивать ключи с новой версией. Аренды пересчёта ``lease:`` тоже
+живут только в общем кэше.
+"""
+import fcntl
+import os
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends import filebased
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from .metrics import record_cache
+
+# Ключи с изменяемыми значениями, которые нельзя держать в процессе.
+SHARED_ONLY_PREFIXES = ('version:', 'changed:', 'lease:')
+LOCAL_MAX_BYTES = 16 * 1024 * 1024
+# Сколько секунд значение без версии в ключе может отставать от общего.
+LOCAL_TIMEOUT = 60
+# Раз в сколько записей файловый кэш сверяет число файлов с MAX_ENTRIES.
+CULL_EVERY = 100
+LOCK_NAME = '.lock'
+
+_missing = object()
+# LRU процесса по имени кэша: экземпляры бэкенда в Django свои у
+# каждого потока, а память процесса у потоков общая.
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """Файловый кэш, общий для процессов, с атомарными add и incr.
+
+    В базовом классе ``incr`` — это чтение и запись отдельными шагами,
+    и два воркера, одновременно увеличившие версию ленты, дали бы одну
+    новую версию вместо двух; ``add`` так же дал бы аренду пересчёта
+    двоим. Здесь оба выполняются под ``flock`` файла ``.lock`` в
+    каталоге кэша, а ``incr`` ещё и сохраняет срок ключа.
+
+    Ещё базовый класс перед каждой записью читает весь каталог, чтобы
+    сравнить число файлов с MAX_ENTRIES; здесь это делается раз в
+    ``CULL_EVERY`` записей.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        options = params.get('OPTIONS', {})
+        self._cull_every = int(options.get('CULL_EVERY', CULL_EVERY))
+        self._sets = 0
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, LOCK_NAME), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        # Базовый incr — это get и set со сроком по умолчанию: версии,
+        # записанные навсегда, через TIMEOUT истекли бы. Срок сохраняем.
+        with self._locked():
+            try:
+                with open(self._key_to_file(key, version), 'rb') as f:
+                    expires = pickle.load(f)
+                    value = pickle.loads(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                expires = value = None
+            now = time.time()
+            if value is None or (expires is not None and expires < now):
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            self.set(key, value,
+                     None if expires is None else expires - now, version)
+            return value
+
+    def _cull(self):
+        self._sets += 1
+        if self._sets % self._cull_every == 0:
+            super()._cull()
+
+
+class LocalTier:
+    """LRU в памяти процесса с вытеснением по суммарному размеру."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _missing
+            expires, data = entry
+            if expires <= time.time():
+                self._pop(key)
+                return _missing
+            self.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def set(self, key, value, expires):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._pop(key)
+            if len(data) > self.max_bytes:
+                return
+            self.entries[key] = (expires, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class TwoTierCache(BaseCache):
+    """LRU процесса перед общим кэшем.
+
+    OPTIONS:
+      ``SHARED`` — настройки общего кэша в формате CACHES;
+      ``LOCAL_MAX_BYTES`` — предел LRU процесса в байтах;
+      ``LOCAL_TIMEOUT`` — сколько секунд хранить значение в процессе.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        shared = dict(options['SHARED'])
+        backend = import_string(shared.pop('BACKEND'))
+        for name in ('KEY_PREFIX', 'VERSION', 'TIMEOUT', 'KEY_FUNCTION'):
+            if name in params:
+                shared.setdefault(name, params[name])
+        self.shared = backend(shared.pop('LOCATION', ''), shared)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', LOCAL_TIMEOUT)
+        with _local_tiers_lock:
+            if location not in _local_tiers:
+                _local_tiers[location] = LocalTier(
+                    options.get('LOCAL_MAX_BYTES', LOCAL_MAX_BYTES))
+            self.local = _local_tiers[location]
+
+    @staticmethod
+    def is_local(key):
+        return not key.startswith(SHARED_ONLY_PREFIXES)
+
+    def local_expiry(self, timeout=DEFAULT_TIMEOUT):
+        expires = time.time() + self.local_timeout
+        backend_expires = self.get_backend_timeout(timeout)
+        if backend_expires is None:
+            return expires
+        return min(expires, backend_expires)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version)
+        if self.is_local(key):
+            value = self.local.get(local_key)
+            if value is not _missing:
+                record_cache(1, 0)
+                return value
+        value = self.shared.get(key, _missing, version)
+        if value is _missing:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        if self.is_local(key):
+            self.local.set(local_key, value, self.local_expiry())
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        if self.is_local(key):
+            self.local.set(self.make_key(key, version), value,
+                           self.local_expiry(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(self.make_key(key, version))
+        return self.shared.add(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_key(key, version))
+        self.shared.delete(key, version)
+
+    def has_key(self, key, version=None):
+        if self.local.get(self.make_key(key, version)) is not _missing:
+            return True
+        return self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self.make_key(key, version))
+        return self.shared.incr(key, delta, version)
+
+    def clear(self):
+        """Чистит общий кэш и LRU этого процесса (не других воркеров)."""
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
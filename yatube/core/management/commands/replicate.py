@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import replica_synced
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файл реплики REPLICA_PATH '
+            'через backup API — замена репликации для локальной проверки '
+            'роутера. С --interval повторяет копирование. Реплика '
+            'подключается при запуске, если её файл уже есть.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Повторять каждые столько секунд.')
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда копирует только базы SQLite.')
+        while True:
+            started = time.monotonic()
+            self.replicate(connection)
+            self.stdout.write(self.style.SUCCESS(
+                f'Реплика обновлена за '
+                f'{time.monotonic() - started:.2f} с: '
+                f'{settings.REPLICA_PATH}'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def replicate(connection):
+        connection.ensure_connection()
+        target = sqlite3.connect(
+            settings.REPLICA_PATH,
+            timeout=connection.settings_dict['OPTIONS'].get('timeout', 5))
+        # Всё, что записано до начала копирования, в реплику попадёт.
+        started = time.time()
+        try:
+            # Вся база за один шаг: реплика всегда согласована.
+            connection.connection.backup(target)
+        finally:
+            target.close()
+        replica_synced(started)
@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.signals import SQLITE_PRAGMAS, apply_pragmas
+
+# Настройки SQLite по умолчанию — то, что было до core.signals.
+DEFAULT_PRAGMAS = (
+    ('journal_mode', 'DELETE'),
+    ('synchronous', 'FULL'),
+)
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+    'pub_date REAL)',
+    'CREATE INDEX post_pub_date ON post (pub_date DESC)',
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite с настройками по '
+            'умолчанию и с PRAGMA из core.signals: читатели выбирают '
+            'свежие посты, писатели добавляют посты по одному в '
+            'транзакции. Работает на временной базе и печатает JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Постов в базе до начала замера.')
+        parser.add_argument('--timeout', type=float, default=5,
+                            help='Сколько ждать блокировку, секунд.')
+
+    def handle(self, *args, **options):
+        report = {
+            name: self.run(pragmas, options)
+            for name, pragmas in (('default', DEFAULT_PRAGMAS),
+                                  ('tuned', SQLITE_PRAGMAS))
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, pragmas, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            connection = self.connect(path, pragmas, options['timeout'])
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.executemany(
+                'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+                ((f'Пост {number}', number) for number in
+                 range(options['rows'])))
+            connection.commit()
+            connection.close()
+
+            stop = threading.Event()
+            counters = {'reads': 0, 'writes': 0, 'locked': 0}
+            lock = threading.Lock()
+            workers = [
+                threading.Thread(target=self.work, args=(
+                    path, pragmas, options['timeout'], self.read, stop,
+                    counters, 'reads', lock))
+                for _ in range(options['readers'])
+            ] + [
+                threading.Thread(target=self.work, args=(
+                    path, pragmas, options['timeout'], self.write, stop,
+                    counters, 'writes', lock))
+                for _ in range(options['writers'])
+            ]
+            for worker in workers:
+                worker.start()
+            time.sleep(options['seconds'])
+            stop.set()
+            for worker in workers:
+                worker.join()
+        seconds = options['seconds']
+        return {
+            'reads_per_second': round(counters['reads'] / seconds),
+            'writes_per_second': round(counters['writes'] / seconds),
+            'locked_errors': counters['locked'],
+        }
+
+    @staticmethod
+    def connect(path, pragmas, timeout):
+        connection = sqlite3.connect(path, timeout=timeout,
+                                     check_same_thread=False)
+        apply_pragmas(connection.cursor(), pragmas)
+        return connection
+
+    def work(self, path, pragmas, timeout, operation, stop, counters, name,
+             lock):
+        # Одно соединение на поток на весь замер, как при CONN_MAX_AGE.
+        connection = self.connect(path, pragmas, timeout)
+        done = locked = 0
+        while not stop.is_set():
+            try:
+                operation(connection)
+                done += 1
+            except sqlite3.OperationalError:
+                connection.rollback()
+                locked += 1
+        connection.close()
+        with lock:
+            counters[name] += done
+            counters['locked'] += locked
+
+    @staticmethod
+    def read(connection):
+        connection.execute(
+            'SELECT id, text FROM post ORDER BY pub_date DESC '
+            'LIMIT 10').fetchall()
+        connection.execute('SELECT count(*) FROM post').fetchone()
+
+    @staticmethod
+    def write(connection):
+        connection.execute('INSERT INTO post (text, pub_date) VALUES (?, ?)',
+                           ('Новый пост', time.time()))
+        connection.commit()
@@ -0,0 +1,196 @@
+"""Метрики запросов по представлениям.
+
+``MetricsMiddleware`` открывает на время запроса ``RequestStats``, куда
+пишут обёртка запросов к базе, бэкенд шаблонов
+(``core.backends.DjangoTemplates``) и кэш (``core.cache``). По
+окончании запроса значения попадают в гистограммы процесса с меткой
+``view`` — именем представления (``posts:index``). Эндпоинт
+``/metrics/`` отдаёт их в текстовом формате Prometheus.
+
+Гистограммы живут в памяти процесса: при нескольких воркерах каждый
+отдаёт свои, а суммирует их уже Prometheus.
+"""
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNRESOLVED_VIEW = 'unresolved'
+
+# Имя метрики, описание, корзины и поле RequestStats (или время ответа).
+HISTOGRAMS = (
+    ('yatube_request_duration_seconds', 'Время ответа.',
+     DURATION_BUCKETS, 'duration'),
+    ('yatube_db_queries', 'Запросов к базе за ответ.',
+     QUERY_BUCKETS, 'db_queries'),
+    ('yatube_db_duration_seconds', 'Время запросов к базе за ответ.',
+     DURATION_BUCKETS, 'db_time'),
+    ('yatube_template_duration_seconds', 'Время рендеринга шаблонов.',
+     DURATION_BUCKETS, 'template_time'),
+)
+COUNTERS = (
+    ('yatube_cache_hits_total', 'Попаданий в кэш.', 'cache_hits'),
+    ('yatube_cache_misses_total', 'Промахов кэша.', 'cache_misses'),
+)
+
+_local = threading.local()
+
+
+class RequestStats:
+    __slots__ = ('db_queries', 'db_time', 'template_time', 'cache_hits',
+                 'cache_misses')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def current():
+    """Статистика текущего запроса или None вне запроса."""
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def collect():
+    stats = RequestStats()
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = None
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка ``connection.execute_wrapper``: число и время запросов."""
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_time += perf_counter() - start
+
+
+def record_cache(hits, misses):
+    stats = current()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+@contextmanager
+def template_timer():
+    """Время рендеринга шаблона.
+
+    Шаблоны, отрисованные внутри другого (``render_to_string`` в
+    шаблонном теге), уже входят во время внешнего и не считаются.
+    """
+    stats = current()
+    if stats is None or getattr(_local, 'rendering', False):
+        yield
+        return
+    _local.rendering = True
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        _local.rendering = False
+        stats.template_time += perf_counter() - start
+
+
+def server_timing(stats, duration):
+    """Заголовок Server-Timing для панели Network в браузере."""
+    return ', '.join((
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_queries} SQL"',
+        f'tpl;dur={stats.template_time * 1000:.1f}',
+        f'cache;desc="{stats.cache_hits} hit / {stats.cache_misses} miss"',
+        f'total;dur={duration * 1000:.1f}',
+    ))
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+        yield '+Inf', self.count
+
+
+class Registry:
+    """Гистограммы и счётчики процесса по представлениям."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name, *_ in HISTOGRAMS}
+            self.counters = {name: {} for name, *_ in COUNTERS}
+
+    def observe(self, view, stats, duration):
+        with self.lock:
+            for name, _, buckets, field in HISTOGRAMS:
+                value = (duration if field == 'duration'
+                         else getattr(stats, field))
+                histograms = self.histograms[name]
+                if view not in histograms:
+                    histograms[view] = Histogram(buckets)
+                histograms[view].observe(value)
+            for name, _, field in COUNTERS:
+                counters = self.counters[name]
+                counters[view] = counters.get(view, 0) + getattr(stats, field)
+
+    def export(self):
+        """Все метрики в текстовом формате Prometheus 0.0.4."""
+        lines = []
+        with self.lock:
+            for name, help_text, *_ in HISTOGRAMS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self.histograms[name].items()):
+                    label = f'view="{escape_label(view)}"'
+                    for bound, count in histogram.cumulative():
+                        lines.append(
+                            f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+            for name, help_text, _ in COUNTERS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for view, value in sorted(self.counters[name].items()):
+                    lines.append(
+                        f'{name}{{view="{escape_label(view)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n')
+
+
+registry = Registry()
@@ -0,0 +1,84 @@
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from . import metrics
+from .routers import replica_reads, replica_synced_at, watch_writes
+
+PRIMARY_COOKIE = 'use_primary'
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса по имени представления.
+
+    Стоит первым в MIDDLEWARE, чтобы учитывать и запросы сессий и
+    пользователей. Время потоковых ответов считается до первого байта.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = perf_counter()
+        with metrics.collect() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.record_query))
+            response = self.get_response(request)
+        duration = perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else metrics.UNRESOLVED_VIEW
+        metrics.registry.observe(view, stats, duration)
+        if settings.DEBUG:
+            response['Server-Timing'] = metrics.server_timing(
+                stats, duration)
+        return response
+
+
+class ReplicaMiddleware:
+    """Отправляет чтения представлений REPLICA_VIEWS на реплику.
+
+    Реплика берётся, только если она скопирована после последней смены
+    версий кэша. После запроса, который писал в базу (в том числе
+    GET-подписка), клиент получает cookie и REPLICA_STICKY_SECONDS
+    читает с основной базы: свои изменения он видит сразу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        synced = self.replica_synced(request)
+        with watch_writes() as writes:
+            if synced is not None:
+                with replica_reads(synced):
+                    response = self.get_response(request)
+            else:
+                response = self.get_response(request)
+        if writes.wrote:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
+
+    @staticmethod
+    def use_replica(request):
+        if (request.method not in ('GET', 'HEAD')
+                or PRIMARY_COOKIE in request.COOKIES
+                or not settings.REPLICA_DATABASES):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.view_name in settings.REPLICA_VIEWS
+
+    @classmethod
+    def replica_synced(cls, request):
+        """Время копирования реплики, если запрос можно читать с неё."""
+        if not cls.use_replica(request):
+            return None
+        return replica_synced_at()
@@ -0,0 +1,103 @@
+"""Чтение с реплик в представлениях, которые ничего не пишут.
+
+``ReplicaMiddleware`` включает чтение с реплики на время GET-запроса к
+представлению из REPLICA_VIEWS, а роутер направляет такие чтения на
+одну из REPLICA_DATABASES. Запись всегда идёт в ``default``, как и
+чтение сессий и пользователей.
+
+Реплика годится, только если скопирована после последней смены версий
+кэша: иначе страница новой версии соберётся из старых данных и
+останется в кэше. Время смены отмечает ``bump_version``, время начала
+копирования — команда ``replicate``.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Приложения, которые всегда читаются с основной базы: сессия и
+# пользователь нужны свежими, в том числе сразу после входа.
+PRIMARY_APPS = ('auth', 'sessions')
+# Ключи с префиксом changed: кэш не держит в локальном уровне.
+PRIMARY_CHANGED_KEY = 'changed:primary'
+REPLICA_SYNCED_KEY = 'changed:replica'
+
+_state = threading.local()
+
+
+@contextmanager
+def replica_reads(synced=None):
+    """Чтения в этом потоке — с реплики (если реплики настроены).
+
+    ``synced`` — время начала копирования реплики, см. ``reads_current``.
+    """
+    _state.replica = True
+    _state.synced = synced
+    try:
+        yield
+    finally:
+        _state.replica = False
+
+
+@contextmanager
+def watch_writes():
+    """Отмечает в ``wrote``, писал ли поток в базу внутри блока."""
+    writes = SimpleNamespace(wrote=False)
+    _state.writes = writes
+    try:
+        yield writes
+    finally:
+        _state.writes = None
+
+
+def replica_synced(started):
+    """Реплика содержит все записи, сделанные до ``started``."""
+    cache.set(REPLICA_SYNCED_KEY, started, None)
+
+
+def replica_synced_at():
+    """Время копирования реплики, если после него версии не менялись."""
+    times = cache.get_many([PRIMARY_CHANGED_KEY, REPLICA_SYNCED_KEY])
+    synced = times.get(REPLICA_SYNCED_KEY)
+    if synced is None or times.get(PRIMARY_CHANGED_KEY, 0) >= synced:
+        return None
+    return synced
+
+
+def reads_current():
+    """Прочитанное в этом потоке не старше текущих версий кэша.
+
+    Версия могла смениться уже после выбора реплики: тогда собранное
+    по её данным под новой версией хранить нельзя.
+    """
+    if not getattr(_state, 'replica', False) or not settings.REPLICA_DATABASES:
+        return True
+    synced = getattr(_state, 'synced', None)
+    return synced is not None and cache.get(PRIMARY_CHANGED_KEY, 0) < synced
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return 'default'
+        if getattr(_state, 'replica', False) and settings.REPLICA_DATABASES:
+            return random.choice(settings.REPLICA_DATABASES)
+        return None
+
+    def db_for_write(self, model, **hints):
+        writes = getattr(_state, 'writes', None)
+        # Сессия и так читается с основной базы.
+        if writes is not None and model._meta.app_label != 'sessions':
+            writes.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,27 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# WAL: читатели не ждут писателя, а писатель — читателей.
+# synchronous=NORMAL в режиме WAL не теряет целостность, лишь последние
+# транзакции при отключении питания. cache_size в минус килобайтах.
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -64 * 1024),
+    ('temp_store', 'MEMORY'),
+)
+
+
+def apply_pragmas(cursor, pragmas=SQLITE_PRAGMAS):
+    for name, value in pragmas:
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor)
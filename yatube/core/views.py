@@ -1,4 +1,11 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import registry
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
 
 
 def page_not_found(request, exception):
@@ -11,3 +18,15 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, "misc/500.html", status=500)
+
+
+def metrics(request):
+    """Метрики для Prometheus: сотрудникам или по токену METRICS_TOKEN"""
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    token = settings.METRICS_TOKEN
+    allowed = request.user.is_staff or bool(token) and constant_time_compare(
+        authorization, f'Bearer {token}')
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.export(),
+                        content_type=PROMETHEUS_CONTENT_TYPE)
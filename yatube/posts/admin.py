@@ -1,6 +1,8 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post
+from .paginator import CachedCountPaginator
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -8,8 +10,38 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    list_select_related = ('author', 'group')
+    date_hierarchy = 'pub_date'
+    # Второй COUNT(*) по всей таблице ради «из N всего» не нужен.
+    show_full_result_count = False
+    raw_id_fields = ('author',)
     empty_value_display = '-пусто-'
 
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return CachedCountPaginator(
+            queryset, per_page, scopes=('index',), orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        # Группа редактируется прямо в списке: без общего списка выбора
+        # каждая строка заново читала бы все группы.
+        if db_field.name == 'group':
+            if not hasattr(request, '_group_choices'):
+                request._group_choices = list(field.choices)
+            field.choices = request._group_choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице — индекс FTS5.
+        if not search.available() or not search.match_expression(
+                search_term):
+            return super().get_search_results(
+                request, queryset, search_term)
+        return queryset.filter(
+            pk__in=search.matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
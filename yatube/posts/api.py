@@ -0,0 +1,184 @@
+"""JSON API лент и постов для мобильного клиента.
+
+Посты и комментарии читаются через ``.values()`` — без создания
+моделей и без шаблонов, страницы листаются только по курсору
+(без ``COUNT`` и ``OFFSET``). Выгрузка всех постов отдаётся потоком.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .models import Comment, Group, Post, User
+from .paginator import CursorPaginator, InvalidCursor
+from .timeline import TimelinePaginator
+from .views import COMMENTS_ON_PAGE, POST_ON_PAGE
+
+API_MAX_LIMIT = 100
+EXPORT_CHUNK_SIZE = 2000
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'image', 'author__username',
+               'group__slug')
+COMMENT_FIELDS = ('id', 'text', 'created', 'author__username')
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def serialize_post(row):
+    image = row['image']
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': Post.image.field.storage.url(image) if image else None,
+    }
+
+
+def serialize_comment(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'created': row['created'],
+        'author': row['author__username'],
+    }
+
+
+def get_limit(request, default):
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        return default
+    return max(1, min(limit, API_MAX_LIMIT))
+
+
+def cursor_page(request, paginator):
+    """Страница по ``?cursor=``; InvalidCursor пробрасывается дальше."""
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return paginator.cursor_page(cursor)
+    return paginator.first_page()
+
+
+def page_links(request, page):
+    links = {}
+    for name, cursor in (('next', page.next_cursor),
+                         ('previous', page.previous_cursor)):
+        links[name] = None
+        if cursor:
+            query = request.GET.copy()
+            query['cursor'] = cursor
+            links[name] = request.build_absolute_uri(
+                f'{request.path}?{query.urlencode()}')
+    return links
+
+
+def posts_response(request, queryset, paginator_class=CursorPaginator,
+                   **options):
+    paginator = paginator_class(queryset.values(*POST_FIELDS),
+                                get_limit(request, POST_ON_PAGE), **options)
+    try:
+        page = cursor_page(request, paginator)
+    except InvalidCursor:
+        return error(400, 'Неверный курсор.')
+    return JsonResponse({
+        'results': [serialize_post(row) for row in page],
+        **page_links(request, page),
+    })
+
+
+def index(request):
+    return posts_response(request, Post.objects.all())
+
+
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return error(404, 'Группа не найдена.')
+    return posts_response(request, Post.objects.filter(group_id=group_id))
+
+
+def profile(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return error(404, 'Автор не найден.')
+    return posts_response(request, Post.objects.filter(author_id=author_id))
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error(401, 'Нужна авторизация.')
+    return posts_response(request, Post.objects.all(), TimelinePaginator,
+                          user=request.user)
+
+
+def comments_page(request, post_id):
+    paginator = CursorPaginator(
+        Comment.objects.filter(post=post_id).values(*COMMENT_FIELDS),
+        get_limit(request, COMMENTS_ON_PAGE),
+        ordering=('-created', '-id'),
+    )
+    return cursor_page(request, paginator)
+
+
+def comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error(404, 'Пост не найден.')
+    try:
+        page = comments_page(request, post_id)
+    except InvalidCursor:
+        return error(400, 'Неверный курсор.')
+    return JsonResponse({
+        'results': [serialize_comment(row) for row in page],
+        **page_links(request, page),
+    })
+
+
+def post_detail(request, post_id):
+    row = Post.objects.filter(pk=post_id).values(*POST_FIELDS).first()
+    if row is None:
+        return error(404, 'Пост не найден.')
+    # Курсор в адресе поста листает его комментарии.
+    try:
+        page = comments_page(request, post_id)
+    except InvalidCursor:
+        return error(400, 'Неверный курсор.')
+    next_comments = None
+    if page.next_cursor:
+        next_comments = request.build_absolute_uri('{}?{}'.format(
+            reverse('posts:api_comments', args=[post_id]),
+            urlencode({'cursor': page.next_cursor})))
+    return JsonResponse({
+        **serialize_post(row),
+        'comments': [serialize_comment(comment) for comment in page],
+        'next_comments': next_comments,
+    })
+
+
+def export_posts(request):
+    """Все посты одним JSON-массивом, потоком и без загрузки в память."""
+    if not request.user.is_authenticated:
+        return error(401, 'Нужна авторизация.')
+    rows = Post.objects.order_by('id').values(*POST_FIELDS).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE)
+
+    def stream():
+        yield '['
+        for number, row in enumerate(rows):
+            if number:
+                yield ','
+            yield json.dumps(serialize_post(row), cls=DjangoJSONEncoder,
+                             ensure_ascii=False)
+        yield ']'
+
+    response = StreamingHttpResponse(
+        stream(), content_type='application/json')
+    response['Content-Disposition'] = 'attachment; filename="posts.json"'
+    return response
@@ -0,0 +1,288 @@
+"""Версии лент для ключей кэша.
+
+У каждой ленты (``index``, ``group:<id>``, ``profile:<id>``,
+``follow:<id>``, ``post:<id>``) есть номер версии. Он входит в ключ
+закэшированного фрагмента, а сигналы увеличивают его при изменении
+постов, комментариев и подписок. Старые фрагменты просто перестают
+запрашиваться, поэтому фрагменты можно хранить долго.
+
+Те же версии дают ETag и Last-Modified страниц (``conditional_page``),
+так что ответ 304 не требует ни запросов к постам, ни шаблонов.
+
+Дорогие значения читаются через ``fetch``: истекающее значение
+заранее пересчитывает один воркер (XFetch и аренда ``lease:``), а
+остальные в это время отдают прежнее. Страницы с ETag прежнюю
+отрисовку прошлой версии не получают: их валидатор уже новый.
+"""
+import hashlib
+import math
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from core.routers import PRIMARY_CHANGED_KEY, reads_current
+
+VERSION_PREFIX = 'version:'
+CHANGED_PREFIX = 'changed:'
+LEASE_PREFIX = 'lease:'
+STALE_PREFIX = 'stale:'
+# Значения fetch лежат как (значение, время расчёта, срок) под своим
+# префиксом: по старым ключам в кэше могли остаться значения без обёртки.
+ENTRY_PREFIX = 'entry:'
+# XFetch: чем больше beta, тем раньше до истечения начинается пересчёт.
+XFETCH_BETA = 1.0
+# Аренда на пересчёт и сколько после истечения можно отдавать прежнее.
+LEASE_TIMEOUT = 10
+STALE_GRACE = 60
+STALE_TIMEOUT = 60 * 60 * 24
+# Сколько ждать чужого пересчёта, если отдать нечего.
+LEASE_WAIT = 2
+LEASE_POLL = 0.05
+
+_local = threading.local()
+
+
+def _initial_version():
+    # Версия, выданная после вытеснения ключа из кэша, не должна
+    # совпасть с уже использованной, поэтому начинаем с текущего времени.
+    return time.time_ns()
+
+
+def get_version(scope):
+    key = VERSION_PREFIX + scope
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*scopes):
+    changed = time.time()
+    # Общее время изменения ставится до версий: кто видит новую версию,
+    # тот видит и его, а по нему решается, догнала ли реплика.
+    cache.set(PRIMARY_CHANGED_KEY, changed, None)
+    for scope in scopes:
+        key = VERSION_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+    cache.set_many({CHANGED_PREFIX + scope: changed for scope in scopes},
+                   None)
+
+
+def last_changed(*scopes):
+    """Время последнего изменения лент."""
+    keys = [CHANGED_PREFIX + scope for scope in scopes]
+    changed = cache.get_many(keys)
+    for key in keys:
+        if key not in changed:
+            # Время вытесненного ключа неизвестно: считаем, что ленту
+            # изменили сейчас, и клиент один раз скачает страницу заново.
+            cache.add(key, time.time(), None)
+            changed[key] = cache.get(key)
+    # Last-Modified точен до секунды: округляем вверх, чтобы изменение
+    # в ту же секунду, что и прошлый ответ, не дало ложный 304.
+    return datetime.fromtimestamp(math.ceil(max(changed.values())),
+                                  tz=timezone.utc)
+
+
+class FeedKey(str):
+    """Ключ фрагмента с ``family`` — тем же ключом без версий.
+
+    По ``family`` хранится последняя отрисовка фрагмента, её отдают,
+    пока новую версию пересчитывает другой воркер.
+    """
+
+    def __new__(cls, key, family):
+        feed_key = super().__new__(cls, key)
+        feed_key.family = family
+        return feed_key
+
+
+def feed_key(request, *scopes):
+    """Ключ фрагмента ленты: версии лент + страница или курсор."""
+    versions = ':'.join(f'{scope}.{get_version(scope)}' for scope in scopes)
+    position = request.GET.get('cursor') or request.GET.get('page') or '1'
+    return FeedKey(f'{versions}:{position}',
+                   f'{":".join(scopes)}:{position}')
+
+
+@contextmanager
+def fresh_values():
+    """Внутри блока ``fetch`` не отдаёт значения по ``stale_key``."""
+    previous = getattr(_local, 'fresh', False)
+    _local.fresh = True
+    try:
+        yield
+    finally:
+        _local.fresh = previous
+
+
+def fetch(key, compute, timeout, stale_key=None, backend=cache):
+    """Значение ``compute()`` из кэша без одновременного пересчёта.
+
+    Значение хранится вместе со временем его расчёта и сроком. Ближе
+    к сроку запрос с вероятностью, растущей по XFetch, берёт аренду и
+    пересчитывает значение заранее; остальные отдают прежнее ещё
+    STALE_GRACE секунд после срока. При промахе (например, после смены
+    версии) без аренды отдаётся последнее значение по ``stale_key``
+    (кроме блока ``fresh_values``), а если его нет — ждём пересчёта не
+    дольше LEASE_WAIT.
+    """
+    entry = backend.get(ENTRY_PREFIX + key)
+    if entry is not None:
+        value, delta, expires = entry
+        early = delta * XFETCH_BETA * -math.log(1 - random.random())
+        if time.time() + early < expires or not _lease(backend, key):
+            return value
+        return _recompute(backend, key, compute, timeout, stale_key)
+    if _lease(backend, key):
+        return _recompute(backend, key, compute, timeout, stale_key)
+    if stale_key is not None and not getattr(_local, 'fresh', False):
+        value = backend.get(STALE_PREFIX + stale_key)
+        if value is not None:
+            return value
+    deadline = time.monotonic() + LEASE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LEASE_POLL)
+        entry = backend.get(ENTRY_PREFIX + key)
+        if entry is not None:
+            return entry[0]
+    # Владелец аренды не успел: считаем сами, без записи.
+    return compute()
+
+
+def _lease(backend, key):
+    return backend.add(LEASE_PREFIX + key, True, LEASE_TIMEOUT)
+
+
+def _recompute(backend, key, compute, timeout, stale_key):
+    try:
+        start = time.time()
+        value = compute()
+        finished = time.time()
+        if not reads_current():
+            # Собрано по реплике, отставшей от версии в ключе.
+            return value
+        expires = finished + (STALE_TIMEOUT if timeout is None else timeout)
+        backend.set(ENTRY_PREFIX + key, (value, finished - start, expires),
+                    None if timeout is None else timeout + STALE_GRACE)
+        if stale_key is not None:
+            backend.set(STALE_PREFIX + stale_key, value, STALE_TIMEOUT)
+    finally:
+        backend.delete(LEASE_PREFIX + key)
+    return value
+
+
+def page_etag(request, scopes):
+    """ETag страницы: версии лент, адрес и то, кто её смотрит."""
+    user = request.user
+    parts = [f'{scope}.{get_version(scope)}' for scope in scopes]
+    parts.append(request.get_full_path())
+    if user.is_authenticated:
+        # В формах страницы есть CSRF-токен, он меняется при входе.
+        parts.append(f'user.{user.pk}')
+        parts.append(request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''))
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def resolve_scopes(scopes_func, request, *args, **kwargs):
+    """Ленты страницы; считаются один раз на запрос."""
+    if not hasattr(request, '_page_scopes'):
+        request._page_scopes = scopes_func(request, *args, **kwargs)
+    return request._page_scopes
+
+
+def conditional_page(scopes_func):
+    """Условный GET по версиям лент, от которых зависит страница.
+
+    ``scopes_func(request, *args, **kwargs)`` возвращает список лент
+    одним индексным запросом или None, если объекта нет (тогда
+    представление отработает как обычно и вернёт 404).
+    """
+    def get_scopes(request, *args, **kwargs):
+        return resolve_scopes(scopes_func, request, *args, **kwargs)
+
+    def etag(request, *args, **kwargs):
+        scopes = get_scopes(request, *args, **kwargs)
+        if scopes is None:
+            return None
+        return page_etag(request, scopes)
+
+    def last_modified(request, *args, **kwargs):
+        # Дата не различает пользователей, поэтому только для гостей.
+        if request.user.is_authenticated:
+            return None
+        scopes = get_scopes(request, *args, **kwargs)
+        if scopes is None:
+            return None
+        return last_changed(*scopes)
+
+    def decorator(view):
+        conditional_view = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # ETag и Last-Modified посчитаны по текущим версиям, поэтому
+            # и тело должно быть их отрисовкой, а не прошлой версии.
+            with fresh_values():
+                response = conditional_view(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            patch_cache_control(response, no_cache=True,
+                                private=request.user.is_authenticated)
+            return response
+        return wrapper
+    return decorator
+
+
+class Uncacheable(Exception):
+    """Ответ, который нельзя класть в кэш (не 200 или потоковый)."""
+
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+def cached_page(scopes_func, timeout):
+    """Кэш всего ответа, пока не изменились его ленты.
+
+    Подходит для страниц, одинаковых для всех пользователей (RSS,
+    Atom): ключ — версии лент и полный адрес вместе с хостом.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scopes = resolve_scopes(scopes_func, request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            versions = ':'.join(
+                f'{scope}.{get_version(scope)}' for scope in scopes)
+            digest = hashlib.md5(
+                request.build_absolute_uri().encode()).hexdigest()
+
+            def render():
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    raise Uncacheable(response)
+                return response.content, response['Content-Type']
+
+            try:
+                content, content_type = fetch(
+                    f'page:{digest}:{versions}', render, timeout,
+                    stale_key=f'page:{digest}')
+            except Uncacheable as error:
+                return error.response
+            return HttpResponse(content, content_type=content_type)
+        return wrapper
+    return decorator
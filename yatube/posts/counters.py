@@ -0,0 +1,52 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Сигналы меняют счётчики атомарно через ``F()``, а команда
+``recount`` пересчитывает их заново, если они разошлись с данными.
+До её запуска разошедшийся счётчик не уходит ниже нуля.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def changed(name, delta):
+    return Greatest(F(name) + delta, 0)
+
+
+def change_user(user_id, **deltas):
+    changes = {name: changed(name, delta) for name, delta in deltas.items()}
+    updated = UserCounters.objects.filter(user_id=user_id).update(**changes)
+    # Строку создаём только при увеличении: уменьшение без строки бывает,
+    # когда пользователь удаляется вместе со своими постами.
+    if not updated and min(deltas.values()) > 0:
+        UserCounters.objects.get_or_create(user_id=user_id)
+        UserCounters.objects.filter(user_id=user_id).update(**changes)
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=changed('posts_count', delta))
+
+
+def _count(queryset, field, outer='pk'):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef(outer)}).order_by().values(
+            field).annotate(count=Count('*')).values('count')), 0)
+
+
+def recount():
+    """Пересчитать все счётчики по данным в таблицах."""
+    UserCounters.objects.bulk_create(
+        (UserCounters(user_id=user_id) for user_id in
+         User.objects.filter(counters=None).values_list('pk', flat=True)),
+        ignore_conflicts=True,
+    )
+    UserCounters.objects.update(
+        posts_count=_count(Post.objects, 'author', 'user'),
+        followers_count=_count(Follow.objects, 'author', 'user'),
+        following_count=_count(Follow.objects, 'user', 'user'),
+        comments_count=_count(Comment.objects, 'author', 'user'),
+    )
+    Group.objects.update(posts_count=_count(Post.objects, 'group'))
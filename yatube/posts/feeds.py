@@ -0,0 +1,133 @@
+"""RSS и Atom лент: главной, групп и авторов.
+
+Тело ленты кэшируется до изменения её версии (``cached_page``), а
+повторный опрос с ETag или If-Modified-Since получает 304
+(``conditional_page``) — агрегаторы, опрашивающие ленты каждые
+несколько минут, не доходят до базы.
+"""
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from .cache import cached_page, conditional_page
+from .models import Group, Post, User
+from .views import group_page_scopes, profile_page_scopes
+
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class PostsFeed(Feed):
+    description_template = None
+
+    def item_title(self, item):
+        return str(item)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.modified
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_author_link(self, item):
+        return reverse('posts:profile', args=[item.author.username])
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+    @staticmethod
+    def latest(posts):
+        return posts.select_related('author', 'group')[:FEED_ITEMS]
+
+
+class LatestPostsFeed(PostsFeed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return self.latest(Post.objects.all())
+
+
+class GroupPostsFeed(PostsFeed):
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def items(self, group):
+        return self.latest(group.posts.all())
+
+
+class AuthorPostsFeed(PostsFeed):
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: записи {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Новые записи автора {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def items(self, author):
+        return self.latest(author.posts.all())
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupPostsAtomFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return self.description(group)
+
+
+class AuthorPostsAtomFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
+
+
+def index_scopes(request):
+    return ['index']
+
+
+def feed_view(feed, scopes_func):
+    return conditional_page(scopes_func)(
+        cached_page(scopes_func, FEED_CACHE_TIMEOUT)(feed))
+
+
+index_rss = feed_view(LatestPostsFeed(), index_scopes)
+index_atom = feed_view(LatestPostsAtomFeed(), index_scopes)
+group_rss = feed_view(GroupPostsFeed(), group_page_scopes)
+group_atom = feed_view(GroupPostsAtomFeed(), group_page_scopes)
+profile_rss = feed_view(AuthorPostsFeed(), profile_page_scopes)
+profile_atom = feed_view(AuthorPostsAtomFeed(), profile_page_scopes)
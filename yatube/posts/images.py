@@ -0,0 +1,62 @@
+"""Подсчёт ссылок постов на файлы картинок.
+
+Одинаковые картинки хранятся одним файлом (см. ``posts.storage``),
+поэтому удалять файл можно только вместе с последней ссылкой на него.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageBlob
+from .storage import content_addressed_storage
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name, refs=1):
+    """Учесть посты, ссылающиеся на файл; True для нового файла."""
+    if not name:
+        return False
+    changes = {'refs': F('refs') + refs}
+    if ImageBlob.objects.filter(name=name).update(**changes):
+        return False
+    _, created = ImageBlob.objects.get_or_create(
+        name=name, defaults={'refs': refs})
+    if not created:
+        ImageBlob.objects.filter(name=name).update(**changes)
+    return created
+
+
+def release(name):
+    """Снять ссылку поста; True, если она была последней.
+
+    Сама запись остаётся до ``remove``: так повторная загрузка той же
+    картинки до коммита увидит её и не станет строить миниатюры заново.
+    """
+    if not name:
+        return False
+    ImageBlob.objects.filter(name=name).update(refs=F('refs') - 1)
+    return ImageBlob.objects.filter(name=name, refs__lte=0).exists()
+
+
+def remove(name):
+    """Удалить файл картинки вместе с её миниатюрами.
+
+    Вызывается после коммита, и к этому моменту на файл могли снова
+    сослаться. Поэтому запись удаляется в транзакции только при нуле
+    ссылок, а файл — только если записи не осталось. Удаление записи
+    берёт блокировку на запись, и новый ``acquire`` того же файла ждёт,
+    пока файл не будет удалён.
+    """
+    # Ошибка здесь не должна ломать запрос.
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.filter(name=name, refs__lte=0).delete()
+            if ImageBlob.objects.filter(name=name).exists():
+                return
+            delete(ImageFile(name, content_addressed_storage))
+    except Exception:
+        logger.exception('Не удалось удалить картинку %s', name)
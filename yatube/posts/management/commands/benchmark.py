@@ -0,0 +1,119 @@
+import json
+import math
+import statistics
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Follow, Group, Post
+
+# Представления, меняющие данные при GET: прогон перестал бы быть
+# повторяемым.
+SKIPPED_VIEWS = ('profile_follow', 'profile_unfollow')
+PERCENTILES = (50, 95, 99)
+# Параметры адресов, без которых представление не делает работы.
+QUERIES = {'search': 'q={word}'}
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все адреса posts/urls.py через тестовый клиент от '
+            'имени пользователя с подписками и печатает JSON с p50/p95/p99 '
+            'времени ответа и числом запросов к базе. Данные — из '
+            'seed_benchmark, чтобы сравнивать версии на одной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Замеров на адрес.')
+        parser.add_argument('--warmup', type=int, default=3,
+                            help='Запросов до замеров (миниатюры, кэш).')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument('--output', help='Файл для JSON вместо stdout.')
+
+    def handle(self, *args, **options):
+        client = Client()
+        follow = Follow.objects.order_by('id').select_related(
+            'user', 'author').first()
+        post = Post.objects.order_by('-pub_date', '-id').first()
+        group = Group.objects.order_by('id').first()
+        if follow is None or post is None or group is None:
+            raise CommandError('Сначала заполните базу: seed_benchmark.')
+        client.force_login(follow.user)
+        values = {
+            'slug': group.slug,
+            'username': follow.author.username,
+            'post_id': post.id,
+            'section': 'posts',
+            'number': 1,
+        }
+        results = {}
+        for pattern in urls.urlpatterns:
+            name = getattr(pattern, 'name', None)
+            if name is None or name in SKIPPED_VIEWS:
+                continue
+            args = [values[key] for key in pattern.pattern.converters]
+            url = reverse(f'{urls.app_name}:{name}', args=args)
+            if name in QUERIES:
+                url += '?' + QUERIES[name].format(word=post.text.split()[0])
+            results[name] = self.measure(client, url, options)
+        report = json.dumps({
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'cold': options['cold'],
+            'views': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+
+    def measure(self, client, url, options):
+        for _ in range(options['warmup']):
+            self.get(client, url)
+        timings = []
+        queries = []
+        for _ in range(options['requests']):
+            if options['cold']:
+                cache.clear()
+            # Чтения могут уйти на реплики: считаем запросы всех баз.
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(
+                        CaptureQueriesContext(connections[alias]))
+                    for alias in ('default', *settings.REPLICA_DATABASES)
+                ]
+                start = perf_counter()
+                status = self.get(client, url)
+                timings.append((perf_counter() - start) * 1000)
+            queries.append(sum(len(context) for context in captured))
+        result = {'url': url, 'status': status}
+        for percent in PERCENTILES:
+            result[f'p{percent}_ms'] = round(percentile(timings, percent), 2)
+        result['mean_ms'] = round(statistics.mean(timings), 2)
+        result['queries'] = max(queries)
+        return result
+
+    @staticmethod
+    def get(client, url):
+        response = client.get(url)
+        if response.streaming:
+            # Потоковый ответ формируется по мере чтения.
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
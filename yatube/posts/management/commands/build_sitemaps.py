@@ -0,0 +1,138 @@
+import os
+import tempfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.management.commands.warm_thumbnails import chunked
+from posts.models import Group, Post, User
+from posts.views import sitemap_name
+
+SITEMAP_LIMIT = 50000
+SITEMAP_CHUNK_SIZE = 2000
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+class Command(BaseCommand):
+    help = ('Записывает карты сайта постов, профилей и групп в файлы '
+            'SITEMAP_ROOT: разделы по 50 000 адресов и индекс sitemap.xml. '
+            'Запускается по расписанию (cron), запросы краулеров только '
+            'отдают готовые файлы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=settings.SITEMAP_BASE_URL)
+        parser.add_argument('--limit', type=int, default=SITEMAP_LIMIT,
+                            help='Адресов в одном файле раздела.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=SITEMAP_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.limit = options['limit']
+        self.chunk_size = options['chunk_size']
+        self.root = settings.SITEMAP_ROOT
+        os.makedirs(self.root, exist_ok=True)
+        sections = (
+            ('posts', self.post_urls()),
+            ('profiles', self.profile_urls()),
+            ('groups', self.group_urls()),
+        )
+        parts = []
+        for section, urls in sections:
+            parts.extend(self.write_section(section, urls))
+        self.write_index(parts)
+        self.remove_stale(parts)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано разделов карты сайта: {len(parts)}'))
+
+    def post_urls(self):
+        rows = Post.objects.order_by('id').values_list(
+            'id', 'modified').iterator(chunk_size=self.chunk_size)
+        for post_id, modified in rows:
+            yield reverse('posts:post_detail', args=[post_id]), modified
+
+    def profile_urls(self):
+        names = User.objects.order_by('id').values_list(
+            'username', flat=True).iterator(chunk_size=self.chunk_size)
+        for username in names:
+            yield reverse('posts:profile', args=[username]), None
+
+    def group_urls(self):
+        slugs = Group.objects.order_by('id').values_list(
+            'slug', flat=True).iterator(chunk_size=self.chunk_size)
+        for slug in slugs:
+            yield reverse('posts:group_list', args=[slug]), None
+
+    def write_section(self, section, urls):
+        """Пишет раздел файлами по ``limit`` адресов.
+
+        Возвращает пары (раздел, номер файла).
+        """
+        parts = []
+        for number, chunk in enumerate(chunked(urls, self.limit), 1):
+            with self.open(sitemap_name(section, number)) as output:
+                output.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                             f'<urlset xmlns="{SITEMAP_NAMESPACE}">\n')
+                for url, lastmod in chunk:
+                    output.write(f'<url><loc>{self.absolute(url)}</loc>')
+                    if lastmod is not None:
+                        output.write(
+                            f'<lastmod>{lastmod.date().isoformat()}'
+                            '</lastmod>')
+                    output.write('</url>\n')
+                output.write('</urlset>\n')
+            parts.append((section, number))
+        return parts
+
+    def write_index(self, parts):
+        lastmod = timezone.now().date().isoformat()
+        with self.open('sitemap.xml') as output:
+            output.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                         f'<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n')
+            for section, number in parts:
+                url = reverse('posts:sitemap_section', args=[section, number])
+                output.write(f'<sitemap><loc>{self.absolute(url)}</loc>'
+                             f'<lastmod>{lastmod}</lastmod></sitemap>\n')
+            output.write('</sitemapindex>\n')
+
+    def remove_stale(self, parts):
+        """Удаляет разделы прошлых запусков, которых больше нет."""
+        keep = {sitemap_name(*part) for part in parts}
+        for name in os.listdir(self.root):
+            if (name.startswith('sitemap-') and name.endswith('.xml')
+                    and name not in keep):
+                os.remove(os.path.join(self.root, name))
+
+    def absolute(self, url):
+        return escape(self.base_url + url)
+
+    def open(self, name):
+        return AtomicFile(os.path.join(self.root, name))
+
+
+class AtomicFile:
+    """Файл, который заменяет прежний только после полной записи.
+
+    Краулер, пришедший во время сборки, получает старую версию
+    целиком, а не обрезанный XML.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        descriptor, self.temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), suffix='.tmp')
+        self.file = os.fdopen(descriptor, 'w', encoding='utf-8')
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.file.close()
+        if exc_type is not None:
+            os.remove(self.temp_path)
+            return
+        os.chmod(self.temp_path, 0o644)
+        os.replace(self.temp_path, self.path)
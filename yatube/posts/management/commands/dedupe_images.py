@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import images
+from posts.models import ImageBlob, Post
+from posts.signals import bump_on_commit, post_scopes
+from posts.storage import content_addressed_storage, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки, загруженные до хранилища по содержимому, '
+            'под имена-хэши: посты с одинаковыми картинками начинают '
+            'ссылаться на один файл, а копии удаляются.')
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        names = [
+            name for name in ImageBlob.objects.order_by(
+                'name').values_list('name', flat=True).iterator()
+            if not is_content_addressed(name)
+        ]
+        moved = 0
+        for name in names:
+            if not storage.exists(name):
+                continue
+            with storage.open(name) as content:
+                new_name = storage.save(name, content)
+            self.move(name, new_name)
+            moved += 1
+        unique = ImageBlob.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {moved}, уникальных файлов: {unique}'))
+
+    @staticmethod
+    @transaction.atomic
+    def move(name, new_name):
+        posts = list(Post.objects.filter(image=name))
+        # update() не вызывает сигналы: кэш карточек и лент сбрасываем
+        # сами, иначе в нём останутся ссылки на удалённый файл.
+        Post.objects.filter(image=name).update(
+            image=new_name, modified=timezone.now())
+        ImageBlob.objects.filter(name=name).delete()
+        images.acquire(new_name, refs=len(posts))
+        for post in posts:
+            bump_on_commit(*post_scopes(post))
+        transaction.on_commit(lambda: images.remove(name))
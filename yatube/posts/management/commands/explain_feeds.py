@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import NEXT, CursorPaginator
+from posts.timeline import TimelinePaginator
+from posts.views import POST_ON_PAGE
+
+FULL_SCAN_MARKERS = ('SCAN TABLE', 'USE TEMP B-TREE')
+
+
+class Command(BaseCommand):
+    help = ('Печатает EXPLAIN QUERY PLAN основных запросов каждой ленты '
+            'и отмечает полные просмотры таблиц и сортировки во '
+            'временном B-дереве.')
+
+    def handle(self, *args, **options):
+        user = User.objects.first()
+        group = Group.objects.first()
+        post = Post.objects.first()
+        if user is None or post is None:
+            self.stderr.write('Нужен хотя бы один пользователь и пост.')
+            return
+        feeds = {
+            'posts:index': Post.objects.all(),
+            'posts:profile': Post.objects.filter(author=user),
+        }
+        if group is not None:
+            feeds['posts:group_list'] = Post.objects.filter(group=group)
+        queries = {}
+        for name, queryset in feeds.items():
+            paginator = CursorPaginator(queryset, POST_ON_PAGE)
+            queries[name] = paginator.object_list[:POST_ON_PAGE]
+            queries[f'{name} (cursor)'] = paginator.cursor_page_queryset(
+                paginator.encode_cursor(NEXT, post))
+        # Посты популярных авторов лента читает как posts:profile.
+        timeline = TimelinePaginator(Post.objects.all(), POST_ON_PAGE, user)
+        queries['posts:follow_index'] = timeline.entries(NEXT, ())
+        queries['posts:follow_index (cursor)'] = timeline.entries(
+            NEXT, (post.pub_date, post.id))
+        queries['posts:post_detail (comments)'] = Comment.objects.filter(
+            post=post)[:POST_ON_PAGE]
+        queries['posts:profile (following)'] = Follow.objects.filter(
+            user=user, author=user)
+        queries['followers'] = Follow.objects.filter(
+            author=user).values_list('user_id', flat=True)
+        problems = 0
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for line in plan.splitlines():
+                if self.is_full_scan(line):
+                    problems += 1
+                    line = self.style.WARNING(line)
+                self.stdout.write(f'  {line}')
+        if problems:
+            self.stdout.write(self.style.WARNING(
+                f'Полных просмотров и сортировок: {problems}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                'Все запросы используют индексы.'))
+
+    @staticmethod
+    def is_full_scan(line):
+        if any(marker in line for marker in FULL_SCAN_MARKERS):
+            return True
+        # Новые версии SQLite пишут «SCAN posts_post» без «TABLE».
+        return ' SCAN ' in f' {line.split("--")[-1].strip()} ' and (
+            'USING' not in line)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков, подписок '
+            'и комментариев по данным в таблицах.')
+
+    def handle(self, *args, **options):
+        recount()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
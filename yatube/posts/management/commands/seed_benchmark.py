@@ -0,0 +1,225 @@
+import random
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from faker import Faker
+from PIL import Image
+
+from posts import timeline
+from posts.counters import recount
+from posts.management.commands.warm_thumbnails import chunked
+from posts.models import Comment, Follow, Group, ImageBlob, Post, User
+from posts.storage import content_addressed_storage
+
+# Точка отсчёта дат: от неё, а не от now(), чтобы данные совпадали
+# между запусками.
+SEED_EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+SEED_SPAN = timedelta(days=365)
+USERNAME_PREFIX = 'bench'
+SEED_PASSWORD = 'benchmark'
+SENTENCE_POOL = 2000
+# Показатель степенного закона: популярность автора ~ 1 / rank ** alpha.
+POPULARITY_ALPHA = 1.1
+IMAGE_SIZE = (960, 339)
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now у полей, чтобы bulk_create сохранил наши даты."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = ('Заполняет пустую базу синтетическими данными для замеров: '
+            'пользователи, группы, посты с картинками, подписки по '
+            'степенному закону и комментарии. При одном и том же --seed '
+            'данные совпадают. Пароль пользователей — "benchmark".')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--images', type=int, default=50,
+                            help='Число разных картинок.')
+        parser.add_argument('--image-ratio', type=float, default=0.2,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if Post.objects.exists():
+            raise CommandError(
+                'В базе уже есть посты: данные не будут воспроизводимы.')
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.sentences = [self.fake.sentence()
+                          for _ in range(SENTENCE_POOL)]
+
+        user_ids = self.create_users(options['users'])
+        # Популярность авторов: первые по списку — самые читаемые.
+        self.popularity = list(accumulate(
+            1 / rank ** POPULARITY_ALPHA
+            for rank in range(1, len(user_ids) + 1)))
+        group_ids = self.create_groups(options['groups'])
+        images = self.create_images(options['images'])
+        post_ids = self.create_posts(options['posts'], user_ids, group_ids,
+                                     images, options['image_ratio'])
+        self.create_follows(user_ids, options['follows'])
+        self.create_comments(options['comments'], user_ids, post_ids)
+
+        self.stdout.write('Пересчёт счётчиков и лент…')
+        recount()
+        followers = Follow.objects.order_by('user_id').values_list(
+            'user_id', flat=True).distinct()
+        for batch in chunked(followers.iterator(), self.batch_size):
+            # Одна транзакция на пачку, а не на каждого пользователя.
+            with transaction.atomic():
+                for user_id in batch:
+                    timeline.rebuild(user_id)
+        # bulk_create не вызывает сигналы: старые фрагменты и ETag
+        # больше не соответствуют данным.
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(user_ids)}, '
+            f'групп {len(group_ids)}, постов {len(post_ids)}, '
+            f'подписок {Follow.objects.count()}, '
+            f'комментариев {options["comments"]}'))
+
+    def create(self, model, objects):
+        total = 0
+        # Размер одного INSERT bulk_create подбирает сам под лимиты СУБД,
+        # а пачки ограничивают объём объектов в памяти.
+        for batch in chunked(objects, self.batch_size):
+            model.objects.bulk_create(batch)
+            total += len(batch)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {total}')
+
+    def created_ids(self, queryset):
+        # SQLite не возвращает id из bulk_create, поэтому перечитываем.
+        return list(queryset.order_by('id').values_list('id', flat=True))
+
+    def date(self, position, total):
+        return SEED_EPOCH - SEED_SPAN + SEED_SPAN * (position / total)
+
+    def text(self, max_sentences):
+        return ' '.join(self.random.choices(
+            self.sentences, k=self.random.randint(1, max_sentences)))
+
+    def create_users(self, count):
+        password = make_password(SEED_PASSWORD)
+        self.create(User, (
+            User(username=f'{USERNAME_PREFIX}{number}',
+                 first_name=self.fake.first_name(),
+                 last_name=self.fake.last_name(),
+                 password=password,
+                 date_joined=SEED_EPOCH - SEED_SPAN)
+            for number in range(count)
+        ))
+        return self.created_ids(
+            User.objects.filter(username__startswith=USERNAME_PREFIX))
+
+    def create_groups(self, count):
+        self.create(Group, (
+            Group(title=f'{self.fake.word().capitalize()} {number}',
+                  slug=f'{USERNAME_PREFIX}-group-{number}',
+                  description=self.text(3))
+            for number in range(count)
+        ))
+        return self.created_ids(
+            Group.objects.filter(slug__startswith=USERNAME_PREFIX))
+
+    def create_images(self, count):
+        names = []
+        for _ in range(count):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            output = BytesIO()
+            Image.new('RGB', IMAGE_SIZE, color).save(output, 'JPEG')
+            names.append(content_addressed_storage.save(
+                'posts/seed.jpg', ContentFile(output.getvalue())))
+        return names
+
+    def create_posts(self, count, user_ids, group_ids, images, image_ratio):
+        refs = Counter()
+
+        def posts():
+            for number in range(count):
+                date = self.date(number, count)
+                image = ''
+                if images and self.random.random() < image_ratio:
+                    image = self.random.choice(images)
+                    refs[image] += 1
+                group_id = None
+                if group_ids and self.random.random() < 0.7:
+                    group_id = self.random.choice(group_ids)
+                yield Post(
+                    text=self.text(8),
+                    author_id=self.random.choices(
+                        user_ids, cum_weights=self.popularity)[0],
+                    group_id=group_id,
+                    image=image,
+                    pub_date=date,
+                    modified=date,
+                )
+
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Post._meta.get_field('modified')):
+            self.create(Post, posts())
+        ImageBlob.objects.bulk_create(
+            (ImageBlob(name=name, refs=count)
+             for name, count in refs.items()),
+            ignore_conflicts=True,
+        )
+        return self.created_ids(Post.objects.all())
+
+    def create_follows(self, user_ids, average):
+        def follows():
+            for user_id in user_ids:
+                count = min(round(self.random.expovariate(1 / average)),
+                            len(user_ids) - 1)
+                authors = set(self.random.choices(
+                    user_ids, cum_weights=self.popularity, k=count))
+                authors.discard(user_id)
+                for author_id in sorted(authors):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        if average > 0 and len(user_ids) > 1:
+            self.create(Follow, follows())
+
+    def create_comments(self, count, user_ids, post_ids):
+        def comments():
+            for _ in range(count):
+                # Комментарий появляется в течение суток после поста.
+                position = self.random.randrange(len(post_ids))
+                yield Comment(
+                    post_id=post_ids[position],
+                    author_id=self.random.choice(user_ids),
+                    text=self.text(3),
+                    created=self.date(position, len(post_ids)) + timedelta(
+                        seconds=self.random.randrange(24 * 60 * 60)),
+                )
+
+        if post_ids:
+            with explicit_dates(Comment._meta.get_field('created')):
+                self.create(Comment, comments())
@@ -0,0 +1,148 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore
+
+from posts.management.commands.warm_thumbnails import chunked
+from posts.models import Post
+from posts.thumbnails import variants
+
+
+class Command(BaseCommand):
+    help = ('Удаляет миниатюры удалённых и изменённых картинок, миниатюры '
+            'устаревших размеров и файлы media/cache без записи в '
+            'хранилище sorl. Работает пачками ограниченного размера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд: их может '
+                 'прямо сейчас создавать другой процесс.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        self.deleted = 0
+        self.reclaimed = 0
+        for source_keys in self.kv_batches('thumbnails'):
+            self.collect_sources(source_keys)
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+        root = sorl_settings.THUMBNAIL_PREFIX.rstrip('/')
+        if default.storage.exists(root):
+            for names in chunked(self.walk(root), self.batch_size):
+                self.collect_files(names, threshold)
+        verb = 'Будет удалено' if self.dry_run else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} миниатюр: {self.deleted}, '
+            f'освобождено байт: {self.reclaimed}'))
+
+    def kv_batches(self, identity):
+        """Ключи хранилища sorl пачками по возрастанию, без OFFSET."""
+        prefix = add_prefix('', identity)
+        last = prefix
+        while True:
+            keys = list(KVStore.objects.filter(
+                key__startswith=prefix, key__gt=last,
+            ).order_by('key').values_list('key', flat=True)[:self.batch_size])
+            if not keys:
+                return
+            last = keys[-1]
+            yield [del_prefix(key) for key in keys]
+
+    def kv_values(self, keys, identity):
+        values = {}
+        for chunk in chunked(keys, self.batch_size):
+            values.update(KVStore.objects.filter(
+                key__in=[add_prefix(key, identity) for key in chunk],
+            ).values_list('key', 'value'))
+        return {del_prefix(key): value for key, value in values.items()}
+
+    def collect_sources(self, source_keys):
+        """Чистит миниатюры пачки исходных картинок."""
+        sources = {
+            key: deserialize_image_file(value)
+            for key, value in self.kv_values(source_keys, 'image').items()
+        }
+        thumbnail_lists = {
+            key: deserialize(value)
+            for key, value in self.kv_values(
+                source_keys, 'thumbnails').items()
+        }
+        thumbnails = {
+            key: deserialize_image_file(value)
+            for key, value in self.kv_values(
+                [key for keys in thumbnail_lists.values() for key in keys],
+                'image').items()
+        }
+        live = set(Post.objects.filter(
+            image__in=[source.name for source in sources.values()],
+        ).values_list('image', flat=True))
+        stale = []
+        for source_key, thumbnail_keys in thumbnail_lists.items():
+            source = sources.get(source_key)
+            expected = set()
+            if source is not None and source.name in live:
+                expected = self.expected_names(source)
+            keep = []
+            for thumbnail_key in thumbnail_keys:
+                thumbnail = thumbnails.get(thumbnail_key)
+                if thumbnail is not None and thumbnail.name in expected:
+                    keep.append(thumbnail_key)
+                    continue
+                if thumbnail is not None:
+                    self.delete_file(thumbnail.name)
+                stale.append(add_prefix(thumbnail_key))
+            if len(keep) == len(thumbnail_keys) or self.dry_run:
+                continue
+            if keep:
+                default.kvstore._set(source_key, keep, identity='thumbnails')
+                continue
+            stale.append(add_prefix(source_key, 'thumbnails'))
+            if source is not None and source.name not in live:
+                stale.append(add_prefix(source_key))
+        if stale and not self.dry_run:
+            default.kvstore._delete_raw(*stale)
+
+    def collect_files(self, names, threshold):
+        """Удаляет файлы, о которых хранилище sorl ничего не знает."""
+        keys = {ImageFile(name, default.storage).key: name for name in names}
+        known = self.kv_values(keys, 'image')
+        for key, name in keys.items():
+            if key in known:
+                continue
+            if default.storage.get_modified_time(name) > threshold:
+                continue
+            self.delete_file(name)
+
+    @staticmethod
+    def expected_names(source):
+        return {
+            default.backend.thumbnail_name(source, size, **options)
+            for _, _, size, options in variants()
+        }
+
+    def walk(self, path):
+        """Файлы каталога и подкаталогов; в памяти один каталог."""
+        directories, files = default.storage.listdir(path)
+        for name in files:
+            yield f'{path}/{name}'
+        for directory in directories:
+            yield from self.walk(f'{path}/{directory}')
+
+    def delete_file(self, name):
+        try:
+            size = default.storage.size(name)
+        except OSError:
+            size = 0
+        if not self.dry_run:
+            default.storage.delete(name)
+        self.deleted += 1
+        self.reclaimed += size
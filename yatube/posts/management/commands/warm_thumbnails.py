@@ -0,0 +1,51 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate_many
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры всех размеров для картинок существующих '
+            'постов в нескольких процессах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct().iterator()
+        chunks = chunked(names, options['chunk_size'])
+        created = 0
+        for count in self.run(chunks, options['processes']):
+            created += count
+            self.stdout.write(f'Готово миниатюр: {created}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры прогреты: {created}'))
+
+    def run(self, chunks, processes):
+        if processes <= 1:
+            yield from map(generate_many, chunks)
+            return
+        # Дочерние процессы не должны наследовать открытые соединения.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=django.setup) as executor:
+            yield from executor.map(generate_many, chunks)
@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count(queryset, field, outer='pk'):
+    # Как posts.counters._count: подзапрос на связь, без JOIN всех связей.
+    return Coalesce(models.Subquery(
+        queryset.filter(**{field: models.OuterRef(outer)}).order_by().values(
+            field).annotate(count=models.Count('*')).values('count')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    Comment = apps.get_model('posts', 'Comment')
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=user_id)
+        for user_id in User.objects.values_list('pk', flat=True))
+    UserCounters.objects.update(
+        posts_count=count(Post.objects, 'author', 'user'),
+        followers_count=count(Follow.objects, 'author', 'user'),
+        following_count=count(Follow.objects, 'user', 'user'),
+        comments_count=count(Comment.objects, 'author', 'user'),
+    )
+    Group.objects.update(posts_count=count(Post.objects, 'group'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_auto_20261018_1929'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+# Полнотекстовый индекс SQLite FTS5: rowid записи равен id поста.
+# Триггеры держат индекс в согласии с текстом поста и названием группы.
+CREATE_SEARCH = [
+    '''
+    CREATE VIRTUAL TABLE posts_post_search USING fts5(
+        text, group_title, tokenize="unicode61 remove_diacritics 2"
+    )
+    ''',
+    '''
+    INSERT INTO posts_post_search(rowid, text, group_title)
+    SELECT post.id, post.text, grp.title
+    FROM posts_post AS post
+    LEFT JOIN posts_group AS grp ON grp.id = post.group_id
+    ''',
+    '''
+    CREATE TRIGGER posts_post_search_insert AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_post_search(rowid, text, group_title)
+        VALUES (new.id, new.text,
+                (SELECT title FROM posts_group WHERE id = new.group_id));
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_post_search_update
+    AFTER UPDATE OF text, group_id ON posts_post
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+        INSERT INTO posts_post_search(rowid, text, group_title)
+        VALUES (new.id, new.text,
+                (SELECT title FROM posts_group WHERE id = new.group_id));
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_post_search_delete AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_group_search_update
+    AFTER UPDATE OF title ON posts_group
+    BEGIN
+        UPDATE posts_post_search SET group_title = new.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    ''',
+]
+
+DROP_SEARCH = [
+    'DROP TRIGGER IF EXISTS posts_group_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_delete',
+    'DROP TRIGGER IF EXISTS posts_post_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_insert',
+    'DROP TABLE IF EXISTS posts_post_search',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # На других СУБД поиск работает без индекса (см. posts.search).
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_auto_20261018_1940'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SEARCH), run(DROP_SEARCH)),
+    ]
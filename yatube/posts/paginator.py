@@ -0,0 +1,242 @@
+import base64
+import binascii
+import hashlib
+
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .cache import fetch, get_version
+
+NEXT = 'n'
+PREVIOUS = 'p'
+SEPARATOR = '|'
+ELLIPSIS = '…'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CachedCountPaginator(Paginator):
+    """Паджинатор, который хранит ``COUNT(*)`` запроса в кэше.
+
+    Ключ строится по SQL запроса и версиям лент ``scopes``: пока посты
+    не менялись, повторный показ списка обходится без подсчёта строк.
+    """
+    count_timeout = 60 * 60
+
+    def __init__(self, object_list, per_page, scopes=(), **kwargs):
+        self.scopes = tuple(scopes)
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if not self.scopes:
+            return super().count
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        versions = ':'.join(
+            f'{scope}.{get_version(scope)}' for scope in self.scopes)
+        digest = hashlib.md5(f'{sql}|{params}'.encode()).hexdigest()
+        # Пока один запрос считает строки заново, остальные видят
+        # прежнее число: для номеров страниц это допустимо.
+        return fetch(f'count:{digest}:{versions}',
+                     lambda: Paginator.count.func(self), self.count_timeout,
+                     stale_key=f'count:{digest}')
+
+
+def no_page_number():
+    raise InvalidPage('У страницы по курсору нет номера.')
+
+
+class CursorPaginator(CachedCountPaginator):
+    """Паджинатор с постраничной навигацией по ключу (keyset).
+
+    Первая страница и переход по курсору (``?cursor=...``) не делают
+    ни ``COUNT``, ни ``OFFSET``: следующая страница выбирается условием
+    ``(pub_date, id) < (последний pub_date, последний id)``,
+    поэтому глубина страницы не влияет на время запроса. Номера
+    страниц (``?page=N``) работают как у ``Paginator``, а число
+    записей для них берётся из кэша по версиям ``scopes``.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id'), **kwargs):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering),
+                         per_page, **kwargs)
+
+    @property
+    def last_cursor(self):
+        """Курсор последней (самой старой) страницы."""
+        return self._encode(PREVIOUS, ())
+
+    def get_page(self, number, cursor=None):
+        if cursor:
+            try:
+                return self.cursor_page(cursor)
+            except InvalidCursor:
+                pass
+        if number is None:
+            return self.first_page()
+        return super().get_page(number)
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS.
+
+        Длина результата не зависит от числа страниц: полный
+        ``page_range`` не создаётся.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2 + 1:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def page(self, number):
+        page = super().page(number)
+        page.object_list = list(page.object_list)
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number))
+        page.next_cursor = None
+        page.previous_cursor = None
+        if page.object_list and page.has_next():
+            page.next_cursor = self.encode_cursor(
+                NEXT, page.object_list[-1])
+        if page.object_list and page.has_previous():
+            page.previous_cursor = self.encode_cursor(
+                PREVIOUS, page.object_list[0])
+        return page
+
+    def first_page(self):
+        """Первая страница без подсчёта записей."""
+        return self._cursor_page(NEXT, ())
+
+    def cursor_page(self, cursor):
+        """Страница, идущая сразу за курсором (или перед ним)."""
+        return self._cursor_page(*self.decode_cursor(cursor))
+
+    def _cursor_page(self, direction, values):
+        backwards = direction == PREVIOUS
+        items = list(self._cursor_queryset(direction, values))
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backwards:
+            items.reverse()
+            has_next, has_previous = bool(values), has_more
+        else:
+            has_next, has_previous = has_more, bool(values)
+        page = self._get_page(items, None, self)
+        # Тип остаётся ровно Page (его проверяют шаблоны и тесты), а
+        # методам, которым нужны номер и count, подставлены ответы из
+        # самой выборки.
+        page.has_next = lambda: has_next
+        page.has_previous = lambda: has_previous
+        page.next_page_number = page.previous_page_number = no_page_number
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items and has_next:
+            page.next_cursor = self.encode_cursor(NEXT, items[-1])
+        if items and has_previous:
+            page.previous_cursor = self.encode_cursor(PREVIOUS, items[0])
+        return page
+
+    def cursor_page_queryset(self, cursor):
+        """Запрос, которым выбирается страница по курсору."""
+        return self._cursor_queryset(*self.decode_cursor(cursor))
+
+    def _cursor_queryset(self, direction, values):
+        backwards = direction == PREVIOUS
+        queryset = self.object_list
+        if values:
+            queryset = queryset.filter(self._seek(values, backwards))
+        if backwards:
+            queryset = queryset.reverse()
+        # Лишняя запись показывает, есть ли страница дальше.
+        return queryset[:self.per_page + 1]
+
+    def encode_cursor(self, direction, obj):
+        return self._encode(direction, [
+            self._value(obj, name) for name in self._field_names()
+        ])
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        except (binascii.Error, UnicodeError, ValueError):
+            raise InvalidCursor(cursor)
+        direction, *raw_values = raw.split(SEPARATOR)
+        if direction not in (NEXT, PREVIOUS):
+            raise InvalidCursor(cursor)
+        if not raw_values:
+            return direction, ()
+        names = self._field_names()
+        if len(raw_values) != len(names):
+            raise InvalidCursor(cursor)
+        meta = self.object_list.model._meta
+        try:
+            values = tuple(
+                meta.get_field(name).to_python(value)
+                for name, value in zip(names, raw_values)
+            )
+        except ValidationError:
+            raise InvalidCursor(cursor)
+        if None in values:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _encode(self, direction, values):
+        raw = SEPARATOR.join([direction, *map(self._serialize, values)])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def _field_names(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _seek(self, values, backwards, ordering=None):
+        """Условие «строго после курсора» в порядке сортировки.
+
+        ``ordering`` задаёт имена полей, если курсор накладывается на
+        другую модель с тем же порядком.
+        """
+        ordering = ordering or self.ordering
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, values):
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # Избыточное условие на первое поле превращает OR в диапазон
+        # по индексу, иначе SQLite просматривает индекс с самого начала.
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') != backwards else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    @staticmethod
+    def _value(obj, name):
+        if isinstance(obj, dict):
+            return obj[name]
+        return getattr(obj, name)
+
+    @staticmethod
+    def _serialize(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
@@ -0,0 +1,115 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite запросы идут в виртуальную таблицу FTS5 ``posts_post_search``
+(создаётся миграцией 0014 вместе с триггерами), результаты
+ранжируются по bm25, а найденные слова подсвечиваются в сниппете.
+На других СУБД остаётся обычный ``icontains`` без сниппетов.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_search'
+# Вес совпадений в тексте поста и в названии группы для bm25.
+TEXT_WEIGHT = 1.0
+GROUP_WEIGHT = 0.5
+SNIPPET_TOKENS = 24
+# Служебные символы вместо <mark>: сниппет экранируется целиком,
+# и лишь потом они заменяются на теги.
+MARK_START = '\x02'
+MARK_END = '\x03'
+WORD = re.compile(r'\w+')
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5: все слова, по префиксу.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 из ввода
+    (NEAR, OR, двоеточия) не выполняются и не дают ошибок разбора.
+    """
+    words = WORD.findall(query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_START, '<mark>').replace(
+        MARK_END, '</mark>'))
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности.
+
+    Поддерживает ``count()`` и срезы, поэтому подходит для обычного
+    ``Paginator``: на страницу уходит один запрос к индексу и один
+    за постами с авторами и группами.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.expression = match_expression(query)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.expression:
+                self._count = 0
+            elif available():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT count(*) FROM {SEARCH_TABLE} '
+                        f'WHERE {SEARCH_TABLE} MATCH %s', [self.expression])
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = self._fallback().count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        limit = (index.stop if index.stop is not None
+                 else self.count()) - start
+        if not self.expression or limit <= 0:
+            return []
+        if not available():
+            return list(self._fallback()[start:start + limit])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({SEARCH_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, %s, %s) LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, '…', SNIPPET_TOKENS,
+                 self.expression, TEXT_WEIGHT, GROUP_WEIGHT, limit, start])
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows])
+        results = []
+        for pk, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
+
+    def _fallback(self):
+        return Post.objects.select_related('author', 'group').filter(
+            text__icontains=self.query)
+
+
+def matching_ids(query):
+    """Подзапрос с id найденных постов для ``filter(pk__in=...)``."""
+    return RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        [match_expression(query)])
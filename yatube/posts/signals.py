@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, images, thumbnails, timeline
+from .cache import bump_version
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+# Поля, из которых шаблоны собирают имя автора.
+AUTHOR_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def post_scopes(post):
+    scopes = ['index', f'profile:{post.author_id}', f'post:{post.pk}']
+    for group_id in {post.group_id, post._loaded_group_id}:
+        if group_id is not None:
+            scopes.append(f'group:{group_id}')
+    return scopes
+
+
+def bump_on_commit(*scopes):
+    # До фиксации другой запрос увидел бы новую версию со старыми
+    # строками и закэшировал бы их под ней.
+    transaction.on_commit(lambda: bump_version(*scopes))
+
+
+def release_image(name):
+    if images.release(name):
+        transaction.on_commit(lambda: images.remove(name))
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+        counters.change_user(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+    elif instance.group_id != instance._loaded_group_id:
+        counters.change_group(instance._loaded_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+    image_changed = instance.image.name != instance._loaded_image
+    if created or image_changed:
+        name = instance.image.name
+        # Миниатюры нужны только для файла, которого ещё не было.
+        if images.acquire(name):
+            transaction.on_commit(lambda: thumbnails.schedule(name))
+        if not created:
+            release_image(instance._loaded_image)
+    bump_on_commit(*post_scopes(instance))
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+    release_image(instance.image.name)
+    bump_on_commit(*post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, comments_count=1)
+    bump_on_commit(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, comments_count=-1)
+    bump_on_commit(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user, instance.author)
+        counters.change_user(instance.author_id, followers_count=1)
+        counters.change_user(instance.user_id, following_count=1)
+        bump_on_commit(f'follow:{instance.user_id}',
+                       f'profile:{instance.author_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.remove(instance.user, instance.author)
+    counters.change_user(instance.author_id, followers_count=-1)
+    counters.change_user(instance.user_id, following_count=-1)
+    bump_on_commit(f'follow:{instance.user_id}',
+                   f'profile:{instance.author_id}')
+
+
+def author_name(user):
+    return tuple(user.__dict__.get(name) for name in AUTHOR_NAME_FIELDS)
+
+
+def author_renamed(user):
+    """Имя автора выводится в карточках его постов, в общей ленте и в
+    лентах групп, где он писал."""
+    posts = Post.objects.filter(author=user)
+    # Ключ карточки содержит время изменения поста.
+    posts.update(modified=timezone.now())
+    groups = posts.exclude(group=None).order_by().values_list(
+        'group_id', flat=True).distinct()
+    bump_on_commit('index', *(f'group:{group_id}' for group_id in groups))
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._loaded_name = author_name(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+    # При входе обновляется только last_login, страницы от него не зависят.
+    elif update_fields is None or set(update_fields) != {'last_login'}:
+        bump_on_commit(f'profile:{instance.pk}')
+        if author_name(instance) != instance._loaded_name:
+            author_renamed(instance)
+    instance._loaded_name = author_name(instance)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    bump_on_commit(f'group:{instance.pk}')
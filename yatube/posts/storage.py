@@ -0,0 +1,67 @@
+"""Хранилище картинок с адресацией по содержимому.
+
+Имя файла — SHA-256 его содержимого, поэтому одна и та же картинка,
+загруженная много раз, лежит на диске один раз, и миниатюры для неё
+тоже строятся один раз. Ссылки постов на файлы считает ``posts.images``.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+SHARD_LENGTH = 2
+DIGEST_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.\w+)?$')
+
+
+def is_content_addressed(name):
+    """Имя уже построено по содержимому файла."""
+    return bool(DIGEST_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файлы сохраняются под именем ``<каталог>/ab/abcdef….<расширение>``.
+
+    Содержимое хэшируется в том же проходе, в котором пишется во
+    временный файл; если такой файл уже есть, временный просто удаляется.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя выбирает _save по содержимому файла.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=self.path(directory), suffix='.upload')
+        try:
+            with os.fdopen(descriptor, 'wb') as temp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:SHARD_LENGTH], hexdigest + extension)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -0,0 +1,55 @@
+"""``{% cache %}`` с защитой от одновременного пересчёта фрагмента.
+
+Синтаксис тот же, что у ``{% load cache %}``. Фрагмент читается через
+``posts.cache.fetch``: истекающий фрагмент пересчитывает один воркер,
+а если среди ``vary_on`` есть ключ с ``family`` (``feed_key``), то
+после смены версии остальные отдают последнюю отрисовку.
+"""
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags import cache as django_cache
+
+from ..cache import fetch
+
+register = template.Library()
+
+
+class FragmentCacheNode(django_cache.CacheNode):
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+            cache_name = (self.cache_name.resolve(context)
+                          if self.cache_name else 'default')
+        except template.VariableDoesNotExist as error:
+            raise template.TemplateSyntaxError(
+                f'"cache" tag got an unknown variable: {error}')
+        if expire_time is not None:
+            try:
+                expire_time = int(expire_time)
+            except (ValueError, TypeError):
+                raise template.TemplateSyntaxError(
+                    f'"cache" tag got a non-integer timeout value: '
+                    f'{expire_time!r}')
+        try:
+            backend = caches[cache_name]
+        except InvalidCacheBackendError:
+            raise template.TemplateSyntaxError(
+                f'Invalid cache name specified for cache tag: {cache_name!r}')
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        family = make_template_fragment_key(
+            self.fragment_name,
+            [getattr(value, 'family', value) for value in vary_on])
+        return fetch(key, lambda: self.nodelist.render(context), expire_time,
+                     stale_key=family if family != key else None,
+                     backend=backend)
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    node = django_cache.do_cache(parser, token)
+    return FragmentCacheNode(node.nodelist, node.expire_time_var,
+                             node.fragment_name, node.vary_on,
+                             node.cache_name)
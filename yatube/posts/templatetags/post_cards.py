@@ -0,0 +1,33 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def card_key(post):
+    return f'post_card:{post.pk}:{post.modified.timestamp()}'
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Карточки постов из кэша одним запросом get_many.
+
+    Ключ карточки содержит время изменения поста, поэтому после
+    редактирования карточка отрисовывается заново.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            missing[key] = render_to_string(
+                'posts/includes/post_card.html', {'post': post})
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
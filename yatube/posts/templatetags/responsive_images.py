@@ -0,0 +1,52 @@
+import logging
+
+from django import template
+from sorl.thumbnail import get_thumbnail
+
+from ..thumbnails import variants
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+FALLBACK_FORMAT = 'JPEG'
+DEFAULT_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+def srcset(thumbnails):
+    return ', '.join(f'{image.url} {image.width}w' for image in thumbnails)
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def responsive_image(image, sizes=DEFAULT_SIZES):
+    """Картинка поста в нескольких ширинах и форматах.
+
+    Браузер сам выбирает из ``srcset`` вариант по ширине экрана и
+    берёт WebP, если его поддерживает; остальным достаётся JPEG.
+    """
+    if not image:
+        return {}
+    thumbnails = {}
+    try:
+        for name, _, size, options in variants():
+            thumbnail = get_thumbnail(image, size, **options)
+            # У миниатюры отсутствующего файла нет размеров.
+            if thumbnail.size:
+                thumbnails.setdefault(name, []).append(thumbnail)
+    except Exception:
+        # Как и {% thumbnail %}, битая картинка не ломает страницу.
+        logger.exception('Не удалось создать миниатюры %s', image)
+        return {}
+    fallback = thumbnails.pop(FALLBACK_FORMAT, None)
+    if not fallback:
+        return {}
+    return {
+        'sources': [
+            {'type': MIME_TYPES[name], 'srcset': srcset(images)}
+            for name, images in thumbnails.items()
+        ],
+        'image': fallback[-1],
+        'srcset': srcset(fallback),
+        'sizes': sizes,
+    }
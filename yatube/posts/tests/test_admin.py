@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+from .utils import BaseTestPost, User, run_on_commit
+
+
+class PostAdminTest(BaseTestPost):
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client = Client()
+        self.client.force_login(admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def get_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_changelist_queries(self):
+        """Список постов не считает строки повторно и не делает N+1."""
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=str(number))
+            for number in range(20)
+        )
+        first = self.get_queries()
+        second = self.get_queries()
+        counts = [sql for sql in second
+                  if 'COUNT(' in sql and '"posts_post"' in sql]
+        self.assertEqual(counts, [])
+        self.assertLess(len(second), len(first))
+        self.assertLess(len(second), 10)
+
+    @run_on_commit()
+    def test_count_invalidated_by_new_post(self):
+        """После нового поста число записей пересчитывается."""
+        self.get_queries()
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_count, 2)
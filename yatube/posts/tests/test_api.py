@@ -0,0 +1,62 @@
+import json
+
+from django.urls import reverse
+
+from ..models import Comment, Post
+from .utils import BaseTestPost
+
+
+class ApiTest(BaseTestPost):
+
+    def setUp(self):
+        self.author_client.force_login(self.author)
+
+    def test_feeds(self):
+        """Ленты отдаются в JSON по курсору."""
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=str(number))
+            for number in range(4)
+        )
+        urls = {
+            reverse('posts:api_index'): 1,
+            reverse('posts:api_group_list', args=[self.group.slug]): 2,
+            reverse('posts:api_profile', args=[self.author.username]): 2,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(queries):
+                    data = self.client.get(url, {'limit': 3}).json()
+                self.assertEqual(len(data['results']), 3)
+                self.assertIsNone(data['previous'])
+                data = self.client.get(data['next']).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [self.post.id, *Post.objects.filter(
+                        text='0').values_list('id', flat=True)][::-1])
+
+    def test_post_detail_and_errors(self):
+        """Пост отдаётся с комментариями; ошибки — тоже в JSON."""
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.id])).json()
+        self.assertEqual(data['author'], self.author.username)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertTrue(data['image'].startswith('/media/posts/'))
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий')
+        for url, status in (
+                (reverse('posts:api_post_detail', args=[0]), 404),
+                (reverse('posts:api_comments', args=[0]), 404),
+                (reverse('posts:api_index') + '?cursor=bad', 400),
+                (reverse('posts:api_follow_index'), 401)):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, status)
+        response = self.author_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.json()['results'], [])
+
+    def test_export_streams_all_posts(self):
+        """Выгрузка отдаёт все посты потоком."""
+        response = self.author_client.get(reverse('posts:api_export_posts'))
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([post['id'] for post in data], [self.post.id])
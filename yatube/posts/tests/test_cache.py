@@ -0,0 +1,75 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..cache import (
+    ENTRY_PREFIX, LEASE_PREFIX, fetch, fresh_values, get_version,
+)
+from ..models import Post
+
+User = get_user_model()
+
+
+class FetchTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.compute = mock.Mock(return_value='новое')
+
+    def test_expired_value_recomputed_once(self):
+        """Истёкшее значение пересчитывает только владелец аренды."""
+        cache.set(ENTRY_PREFIX + 'key', ('старое', 0.1, time.time() - 1))
+        cache.add(LEASE_PREFIX + 'key', True)
+        self.assertEqual(fetch('key', self.compute, 60), 'старое')
+        self.compute.assert_not_called()
+        cache.delete(LEASE_PREFIX + 'key')
+        self.assertEqual(fetch('key', self.compute, 60), 'новое')
+        self.assertEqual(fetch('key', self.compute, 60), 'новое')
+        self.compute.assert_called_once()
+
+    def test_new_version_served_stale_during_recompute(self):
+        """После смены версии без аренды отдаётся прошлая отрисовка."""
+        fetch('key:1', lambda: 'старое', 60, stale_key='key')
+        cache.add(LEASE_PREFIX + 'key:2', True)
+        self.assertEqual(
+            fetch('key:2', self.compute, 60, stale_key='key'), 'старое')
+        self.compute.assert_not_called()
+
+    @mock.patch('posts.cache.LEASE_WAIT', 0)
+    def test_fresh_values_skip_stale(self):
+        """Под валидаторами новой версии прошлая отрисовка не отдаётся."""
+        fetch('key:1', lambda: 'старое', 60, stale_key='key')
+        cache.add(LEASE_PREFIX + 'key:2', True)
+        with fresh_values():
+            self.assertEqual(
+                fetch('key:2', self.compute, 60, stale_key='key'), 'новое')
+
+    def test_unwrapped_value_ignored(self):
+        """Значение по тому же ключу без обёртки fetch не мешает."""
+        cache.set('key', 'старое')
+        self.assertEqual(fetch('key', self.compute, 60), 'новое')
+
+    def test_fresh_value_not_recomputed(self):
+        """До срока значение берётся из кэша."""
+        fetch('key', lambda: 'старое', 60)
+        self.assertEqual(fetch('key', self.compute, 60), 'старое')
+        self.compute.assert_not_called()
+
+
+class BumpOnCommitTest(TestCase):
+
+    def test_version_bumped_after_commit(self):
+        """Версия ленты меняется только после фиксации транзакции."""
+        author = User.objects.create_user(username='author')
+        callbacks = []
+        with mock.patch('posts.signals.transaction.on_commit',
+                        side_effect=callbacks.append):
+            version = get_version('index')
+            Post.objects.create(author=author, text='Пост')
+            self.assertEqual(get_version('index'), version)
+            for callback in callbacks:
+                callback()
+        self.assertNotEqual(get_version('index'), version)
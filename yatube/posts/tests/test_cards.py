@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from ..models import Post
+from ..templatetags.post_cards import card_key, post_cards
+from ..templatetags.responsive_images import responsive_image
+from ..thumbnails import THUMBNAIL_WIDTHS
+from .utils import BaseTestPost
+
+
+class PostCardCacheTest(BaseTestPost):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_card_cached(self):
+        """Карточка поста кладётся в кэш и берётся из него."""
+        post_cards([self.post])
+        self.assertIsNotNone(cache.get(card_key(self.post)))
+        cache.set(card_key(self.post), 'из кэша')
+        self.assertEqual(post_cards([self.post]), ['из кэша'])
+
+    def test_edit_invalidates_card(self):
+        """После редактирования карточка отрисовывается заново."""
+        self.author_client.force_login(self.author)
+        post_cards([self.post])
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст', 'group': self.group.id},
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertNotEqual(card_key(post), card_key(self.post))
+        self.assertIn('Новый текст', post_cards([post])[0])
+
+
+class ResponsiveImageTest(BaseTestPost):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_srcset_lists_every_width(self):
+        """Картинка поста отдаётся в srcset во всех ширинах."""
+        context = responsive_image(self.post.image)
+        for width in THUMBNAIL_WIDTHS:
+            with self.subTest(width=width):
+                self.assertIn(f' {width}w', context['srcset'])
+        self.assertEqual(context['image'].width, max(THUMBNAIL_WIDTHS))
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertContains(response, context['srcset'])
+
+    def test_no_image(self):
+        """Пост без картинки не выводит <picture>."""
+        self.assertEqual(responsive_image(None), {})
@@ -0,0 +1,157 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from sorl.thumbnail import default, get_thumbnail
+
+from ..models import Follow, Post, TimelineEntry, User
+from ..thumbnails import THUMBNAIL_GEOMETRIES, generate
+from .utils import BaseTestPost
+
+
+class ExplainFeedsCommandTest(BaseTestPost):
+
+    def test_feeds_use_indexes(self):
+        """Ленты по автору, группе и главная читаются по индексам."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out, no_color=True)
+        output = out.getvalue()
+        for index in ('post_pub_date_idx', 'post_author_pub_date_idx',
+                      'post_group_pub_date_idx', 'comment_post_created_idx'):
+            with self.subTest(index=index):
+                self.assertIn(index, output)
+
+
+class ThumbnailsTest(BaseTestPost):
+
+    def setUp(self):
+        # Записи sorl о миниатюрах других классов указывают на уже
+        # удалённые временные файлы.
+        cache.clear()
+
+    def test_warm_thumbnails(self):
+        """Команда warm_thumbnails создаёт миниатюры картинок постов."""
+        out = StringIO()
+        call_command('warm_thumbnails', processes=1, stdout=out)
+        self.assertIn(f'Миниатюры прогреты: {len(THUMBNAIL_GEOMETRIES)}',
+                      out.getvalue())
+        for geometry, options in THUMBNAIL_GEOMETRIES:
+            thumbnail = get_thumbnail(self.post.image, geometry, **options)
+            self.assertTrue(thumbnail.exists())
+
+    def test_image_upload_schedules_thumbnails(self):
+        """Миниатюры ставятся в очередь один раз для каждого файла."""
+        with mock.patch('posts.signals.transaction.on_commit',
+                        side_effect=lambda func: func()), \
+                mock.patch('posts.thumbnails.schedule') as schedule:
+            self.post.text = 'Новый текст'
+            self.post.save()
+            schedule.assert_not_called()
+            post = Post.objects.create(author=self.author,
+                                       image='posts/new.gif')
+            schedule.assert_called_once_with(post.image.name)
+            Post.objects.create(author=self.author, image=post.image.name)
+            schedule.assert_called_once()
+
+
+class ThumbnailGcTest(BaseTestPost):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_removes_orphans_and_keeps_live_thumbnails(self):
+        """thumbnail_gc удаляет только ненужные миниатюры."""
+        deleted = Post.objects.create(author=self.author,
+                                      image=self.post.image.name + '.copy')
+        default_storage.save(deleted.image.name, self.post.image.file)
+        generate(self.post.image.name)
+        generate(deleted.image.name)
+        live = [get_thumbnail(self.post.image, geometry, **options)
+                for geometry, options in THUMBNAIL_GEOMETRIES]
+        orphans = [get_thumbnail(deleted.image, geometry, **options)
+                   for geometry, options in THUMBNAIL_GEOMETRIES]
+        stray = default_storage.save('cache/st/ra/y/stray.jpg',
+                                     ContentFile(b'stray'))
+        deleted.delete()
+        out = StringIO()
+        call_command('thumbnail_gc', min_age=0, stdout=out)
+        self.assertIn(f'Удалено миниатюр: {len(orphans) + 1}',
+                      out.getvalue())
+        self.assertFalse(default_storage.exists(stray))
+        for thumbnail in orphans:
+            self.assertFalse(thumbnail.exists())
+        for thumbnail in live:
+            self.assertTrue(thumbnail.exists())
+
+    def test_sharded_layout(self):
+        """Глубина каталогов миниатюр берётся из настроек."""
+        geometry, options = THUMBNAIL_GEOMETRIES[0]
+        for depth in (1, 3):
+            with self.settings(THUMBNAIL_SHARD_DEPTH=depth):
+                name = default.backend.thumbnail_name(
+                    self.post.image.name, geometry, **options)
+            with self.subTest(depth=depth):
+                self.assertEqual(name.count('/'), depth + 1)
+
+
+class BuildSitemapsTest(BaseTestPost):
+
+    def test_sections_and_index(self):
+        """Карта сайта делится на разделы и отдаётся из готовых файлов."""
+        Post.objects.create(author=self.author, text='Второй пост')
+        with tempfile.TemporaryDirectory() as root, \
+                override_settings(SITEMAP_ROOT=root):
+            self.assertEqual(
+                self.client.get(reverse('posts:sitemap')).status_code, 404)
+            open(os.path.join(root, 'sitemap-posts-9.xml'), 'w').close()
+            call_command('build_sitemaps', limit=1, stdout=StringIO())
+            self.assertEqual(sorted(os.listdir(root)), [
+                'sitemap-groups-1.xml', 'sitemap-posts-1.xml',
+                'sitemap-posts-2.xml', 'sitemap-profiles-1.xml',
+                'sitemap.xml',
+            ])
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse('posts:sitemap'))
+            index = b''.join(response.streaming_content).decode()
+            self.assertIn(reverse('posts:sitemap_section',
+                                  args=['posts', 2]), index)
+            response = self.client.get(
+                reverse('posts:sitemap_section', args=['posts', 1]))
+            self.assertIn(
+                reverse('posts:post_detail', args=[self.post.id]),
+                b''.join(response.streaming_content).decode())
+
+
+class SeedBenchmarkTest(BaseTestPost):
+
+    def test_seed_and_benchmark(self):
+        """seed_benchmark заполняет базу, benchmark замеряет адреса."""
+        # Данные воспроизводимы только на пустой базе.
+        Post.objects.all().delete()
+        call_command('seed_benchmark', users=20, groups=2, posts=50,
+                     comments=30, follows=3, images=2, stdout=StringIO())
+        self.assertEqual(
+            User.objects.filter(username__startswith='bench').count(), 20)
+        self.assertEqual(Post.objects.count(), 50)
+        follow = Follow.objects.first()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=follow.user, post__author=follow.author).exists())
+        self.assertEqual(follow.author.counters.followers_count,
+                         follow.author.following.count())
+        out = StringIO()
+        call_command('benchmark', requests=2, warmup=0, stdout=out)
+        views = json.loads(out.getvalue())['views']
+        self.assertNotIn('profile_follow', views)
+        self.assertEqual(views['index']['status'], 200)
+        self.assertEqual(
+            set(views['post_detail']),
+            {'url', 'status', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms',
+             'queries'})
@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_do_not_go_below_zero(self):
+        """Разошедшийся нулевой счётчик не ломает удаление поста."""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Тестовый текст')
+        UserCounters.objects.filter(user=self.author).update(posts_count=0)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=0)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики."""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Тестовый текст')
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_follow_and_comment_counters(self):
+        """Подписка и комментарий меняют счётчики обоих пользователей."""
+        post = Post.objects.create(author=self.author, text='Тестовый текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        self.assertEqual(self.counters(self.reader).comments_count, 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_delete_user_with_posts(self):
+        """Удаление автора вместе с постами не ломает счётчики."""
+        user = User.objects.create_user(username='leaving')
+        Post.objects.create(author=user, text='Тестовый текст')
+        user_id = user.pk
+        user.delete()
+        self.assertFalse(UserCounters.objects.filter(
+            user_id=user_id).exists())
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет разошедшиеся счётчики."""
+        Post.objects.create(author=self.author, group=self.group,
+                            text='Тестовый текст')
+        UserCounters.objects.update(posts_count=42, followers_count=7)
+        UserCounters.objects.filter(user=self.reader).delete()
+        Group.objects.update(posts_count=5)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).posts_count, 0)
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.other_group.posts_count, 0)
@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from ..models import Post
+from .utils import BaseTestPost, run_on_commit
+
+
+class FeedTest(BaseTestPost):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        """RSS и Atom отдаются для главной, группы и автора."""
+        urls = {
+            reverse('posts:index_rss'): 'application/rss+xml',
+            reverse('posts:index_atom'): 'application/atom+xml',
+            reverse('posts:group_rss', args=[self.group.slug]):
+                'application/rss+xml',
+            reverse('posts:group_atom', args=[self.group.slug]):
+                'application/atom+xml',
+            reverse('posts:profile_rss', args=[self.author.username]):
+                'application/rss+xml',
+            reverse('posts:profile_atom', args=[self.author.username]):
+                'application/atom+xml',
+        }
+        post_url = reverse('posts:post_detail', args=[self.post.id])
+        for url, content_type in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(
+                    response['Content-Type'].startswith(content_type))
+                self.assertIn(post_url, response.content.decode())
+        for name in ('group_rss', 'profile_atom'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(f'posts:{name}',
+                                                   args=['missing']))
+                self.assertEqual(response.status_code, 404)
+
+    @run_on_commit()
+    def test_feed_cached_until_new_post(self):
+        """Лента берётся из кэша, пока в ней не появится новый пост."""
+        url = reverse('posts:group_rss', args=[self.group.slug])
+        response = self.client.get(url)
+        # Остаётся лишь запрос id группы для версии ленты.
+        with self.assertNumQueries(1):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, response.content)
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Новый пост в ленте')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(post.text, response.content.decode())
@@ -0,0 +1,93 @@
+import os
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from ..models import ImageBlob, Post
+from ..storage import is_content_addressed
+from .utils import BaseTestPost
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xF9\x04'
+    b'\x01\x00\x00\x00\x00\x2C\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x01\x00\x00'
+)
+
+
+class ContentAddressedImageTest(BaseTestPost):
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.author,
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом со счётчиком ссылок."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('posts/'))
+        self.assertTrue(first.image.name.endswith('.gif'))
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.name)],
+        )
+        self.assertEqual(ImageBlob.objects.get(name=first.image.name).refs, 2)
+
+    def test_last_reference_removes_file(self):
+        """Файл удаляется вместе с последним ссылающимся постом."""
+        with mock.patch('posts.signals.transaction.on_commit',
+                        side_effect=lambda func: func()), \
+                mock.patch('posts.thumbnails.schedule'):
+            first = self.create_post('first.gif')
+            second = self.create_post('second.gif')
+            path = first.image.path
+            first.delete()
+            self.assertTrue(os.path.exists(path))
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(
+            ImageBlob.objects.filter(name=first.image.name).exists())
+
+    def test_reupload_before_removal_keeps_file(self):
+        """Файл не удаляется, если на него сослались до удаления."""
+        callbacks = []
+        with mock.patch('posts.signals.transaction.on_commit',
+                        side_effect=callbacks.append), \
+                mock.patch('posts.thumbnails.schedule') as schedule:
+            first = self.create_post('first.gif')
+            callbacks.clear()
+            first.delete()
+            second = self.create_post('second.gif')
+            for callback in callbacks:
+                callback()
+        schedule.assert_not_called()
+        self.assertTrue(os.path.exists(second.image.path))
+        self.assertEqual(ImageBlob.objects.get(name=second.image.name).refs, 1)
+
+    def test_dedupe_legacy_images(self):
+        """dedupe_images сводит старые копии картинки к одному файлу."""
+        legacy = [
+            default_storage.save(f'posts/legacy{number}.gif',
+                                 ContentFile(SMALL_GIF))
+            for number in range(2)
+        ]
+        posts = [Post.objects.create(author=self.author, image=name)
+                 for name in legacy]
+        with mock.patch('posts.management.commands.dedupe_images.'
+                        'transaction.on_commit',
+                        side_effect=lambda func: func()):
+            call_command('dedupe_images', stdout=StringIO())
+        names = {post.image.name for post in
+                 Post.objects.filter(pk__in=[post.pk for post in posts])}
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(is_content_addressed(name))
+        self.assertEqual(ImageBlob.objects.get(name=name).refs, 2)
+        for old_name in legacy:
+            self.assertFalse(default_storage.exists(old_name))
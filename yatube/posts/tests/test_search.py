@@ -0,0 +1,56 @@
+from django.test import Client
+from django.urls import reverse
+
+from ..models import Group, Post
+from .utils import BaseTestPost, User
+
+
+class SearchTest(BaseTestPost):
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_ranked_results_with_snippet(self):
+        """Поиск находит пост по префиксу слова и подсвечивает его."""
+        Post.objects.create(author=self.author, text='<b>Котики</b> и собаки')
+        Post.objects.create(author=self.author, text='Котики котики котики')
+        results = self.search('котик')
+        self.assertEqual(results[0].text, 'Котики котики котики')
+        self.assertEqual(
+            results[1].snippet,
+            '&lt;b&gt;<mark>Котики</mark>&lt;/b&gt; и собаки')
+        response = self.client.get(reverse('posts:search'), {'q': 'котик'})
+        self.assertTemplateUsed(response, 'posts/includes/post_card.html')
+        self.assertContains(response, '<mark>Котики</mark>', count=2)
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке поста и названия группы."""
+        self.post.text = 'Совсем другие слова'
+        self.post.save()
+        self.assertEqual(self.search('текст'), [])
+        self.assertEqual(self.search('другие'), [self.post])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Путешествия'
+        group.save()
+        self.assertEqual(self.search('путешествия'), [self.post])
+        self.post.delete()
+        self.assertEqual(self.search('другие'), [])
+
+    def test_operators_in_query(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        for query in ('"', 'NEAR(', 'text:', '*', 'OR'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('posts:search'),
+                                           {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_search(self):
+        """Поиск в админке использует тот же индекс."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'тестов'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.post])
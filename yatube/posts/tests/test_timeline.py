@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from ..models import Follow, Post, TimelineEntry, UserCounters
+from ..timeline import FANOUT_LIMIT, TimelinePaginator, fan_out
+
+User = get_user_model()
+
+
+def timeline_posts(user):
+    return list(TimelinePaginator(Post.objects.all(), 10, user).first_page())
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(author=cls.author,
+                                           text='Старый пост')
+
+    def test_follow_backfills_timeline(self):
+        """После подписки в ленте появляются старые посты автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(timeline_posts(self.reader)), [self.old_post])
+
+    def test_new_post_fanned_out(self):
+        """Новый пост раздаётся в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+
+    def test_unfollow_clears_timeline(self):
+        """После отписки посты автора пропадают из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(timeline_posts(self.reader), [])
+
+    @mock.patch('posts.timeline.FANOUT_LIMIT', 0)
+    def test_popular_author_read_on_demand(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertIn(post, timeline_posts(self.reader))
+
+    @mock.patch('posts.timeline.TRIM_SLACK', 0)
+    @mock.patch('posts.timeline.TIMELINE_LENGTH', 2)
+    def test_timeline_trimmed(self):
+        """Лента обрезается до TIMELINE_LENGTH записей."""
+        for i in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader).order_by(
+                '-pub_date', '-post').values_list('post', flat=True)),
+            [post.pk, post.pk - 1])
+
+    @mock.patch('posts.timeline.TRIM_SLACK', 2)
+    @mock.patch('posts.timeline.TIMELINE_LENGTH', 2)
+    def test_timeline_trimmed_after_slack(self):
+        """Раздача обрезает ленту, только когда та переросла запас."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        entries = TimelineEntry.objects.filter(user=self.reader)
+        self.assertEqual(entries.count(), 4)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(entries.count(), 2)
+
+    @mock.patch('posts.timeline.TRIM_SLACK', 2)
+    @mock.patch('posts.timeline.TIMELINE_LENGTH', 2)
+    def test_fan_out_queries_independent_of_followers(self):
+        """Число запросов раздачи не растёт с числом подписчиков."""
+        for i in range(20):
+            reader = User.objects.create_user(username=f'reader{i}')
+            Follow.objects.create(user=reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        # Счётчик и список подписчиков, вставка записей, поиск
+        # переросших лент — сколько бы ни было подписчиков.
+        with self.assertNumQueries(4):
+            fan_out(post)
+
+    def test_timeline_pages_merge_popular_authors(self):
+        """Страницы ленты сливают раздачу и посты популярных авторов."""
+        popular = User.objects.create_user(username='popular')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=popular)
+        UserCounters.objects.filter(user=popular).update(
+            followers_count=FANOUT_LIMIT + 1)
+        posts = [Post.objects.create(author=author, text=str(number))
+                 for number, author in enumerate([self.author, popular] * 2)]
+        expected = [*reversed(posts), self.old_post]
+        paginator = TimelinePaginator(Post.objects.all(), 2, self.reader)
+        page = paginator.first_page()
+        pages = [list(page)]
+        while page.next_cursor:
+            page = paginator.cursor_page(page.next_cursor)
+            pages.append(list(page))
+        self.assertEqual(pages, [expected[:2], expected[2:4], expected[4:]])
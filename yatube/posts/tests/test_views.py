@@ -1,11 +1,14 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Group, Post, Follow, Comment
-from .utils import BaseTestPost
+from ..paginator import ELLIPSIS, CursorPaginator
+from .utils import BaseTestPost, run_on_commit
 
 User = get_user_model()
 
@@ -51,24 +54,48 @@ class PostPagesTest(BaseTestPost):
         content_before_text = self.author_client.get(
             reverse("posts:index")
         ).content
+        Post.objects.filter(pk=self.post.pk).update(text="ылвалыватьдл")
+        content_cash_text = self.author_client.get(
+            reverse("posts:index")
+        ).content
+        cache.clear()
+        content_after_clear_text = self.author_client.get(
+            reverse("posts:index")
+        ).content
+        Post.objects.filter(pk=self.post.pk).update(text=self.post.text)
+        self.assertEqual(content_before_text, content_cash_text)
+        self.assertNotEqual(content_before_text, content_after_clear_text)
+
+    @run_on_commit()
+    def test_homepage_cache_invalidated(self):
+        """Создание и удаление поста сбрасывает кэш ленты"""
         cache.clear()
+        content_before_text = self.author_client.get(
+            reverse("posts:index")
+        ).content
         post = Post.objects.create(text="ылвалыватьдл",
                                         author=self.author,)
         content_after_text = self.author_client.get(
             reverse("posts:index")
         ).content
         post.delete()
-        content_cash_text = self.author_client.get(
+        content_delete_text = self.author_client.get(
             reverse("posts:index")
         ).content
+        self.assertNotEqual(content_before_text, content_after_text)
+        self.assertEqual(content_before_text, content_delete_text)
+
+    def test_cache_depends_on_page(self):
+        """Разные страницы ленты кэшируются отдельно"""
         cache.clear()
-        content_delete_cash_text = self.author_client.get(
-            reverse("posts:index")
+        for i in range(10):
+            Post.objects.create(text=f"Пост {i}", author=self.author)
+        first_page = self.author_client.get(reverse("posts:index")).content
+        second_page = self.author_client.get(
+            reverse("posts:index"), {"page": 2}
         ).content
-        self.assertEqual(content_before_text, content_delete_cash_text)
-        self.assertEqual(content_after_text, content_cash_text)
-        self.assertNotEqual(content_before_text, content_after_text)
-        self.assertNotEqual(content_after_text, content_delete_cash_text)
+        self.assertNotEqual(first_page, second_page)
+        self.assertIn(self.post.text.encode(), second_page)
 
     def test_group_list_show_correct_context(self):
         """Шаблон group_list сформирован с правильным контекстом."""
@@ -202,6 +229,67 @@ class PaginatorViewTest(TestCase):
                 response = self.client.get(post + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_elided_page_range(self):
+        """Номера страниц выводятся окном вокруг текущей."""
+        paginator = CursorPaginator(Post.objects.all(), 1)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(7)),
+            [1, ELLIPSIS, 5, 6, 7, 8, 9, ELLIPSIS, 13])
+        self.assertEqual(list(paginator.get_elided_page_range(2)),
+                         [1, 2, 3, 4, ELLIPSIS, 13])
+        self.assertEqual(list(paginator.get_elided_page_range(13)),
+                         [1, ELLIPSIS, 11, 12, 13])
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(response.context['page_obj'].elided_page_range,
+                         [1, 2])
+
+    def test_cursor_pages(self):
+        """Переход по курсору листает страницы в обе стороны."""
+        first_page = self.client.get(
+            reverse('posts:index')).context['page_obj']
+        second_page = self.client.get(
+            reverse('posts:index'),
+            {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertEqual(second_page[0].text, 'Тестовый текст 2')
+        previous_page = self.client.get(
+            reverse('posts:index'),
+            {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+        self.assertIsNone(previous_page.previous_cursor)
+
+    def test_last_and_invalid_cursor(self):
+        """Курсор последней страницы и битый курсор."""
+        last_page = self.client.get(
+            reverse('posts:index'),
+            {'cursor': 'cA=='}
+        ).context['page_obj']
+        self.assertEqual(len(last_page), 10)
+        self.assertEqual(last_page[-1].text, 'Тестовый текст 0')
+        self.assertIsNone(last_page.next_cursor)
+        self.assertIsNotNone(last_page.previous_cursor)
+        broken_page = self.client.get(
+            reverse('posts:index'),
+            {'cursor': 'not-a-cursor'}
+        ).context['page_obj']
+        self.assertEqual(broken_page[0].text, 'Тестовый текст 12')
+        self.assertIsNone(broken_page.previous_cursor)
+
+    def test_first_page_without_count(self):
+        """Первая страница не считает записи и работает как Page."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get(
+                reverse('posts:index')).context['page_obj']
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in queries.captured_queries))
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_other_pages())
+
 
 class FollowTests(TestCase):
     def setUp(self):
@@ -259,3 +347,109 @@ class FollowTests(TestCase):
         get_comment = response.context['comments'][0].text
         self.assertEqual(Comment.objects.count(), comments_count + 1)
         self.assertEqual(get_comment, form_data['text'])
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author,
+                                       text='Тестовый текст')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author,
+                    text=f'Комментарий {i}')
+            for i in range(25)
+        )
+
+    def test_post_detail_shows_newest_comments(self):
+        """На странице поста только последние комментарии."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, 'Комментарий 24')
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_comments_fragment(self):
+        """Фрагмент отдаёт следующую порцию комментариев."""
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.id}),
+            {'cursor': first.next_cursor},
+        )
+        comments = response.context['comments']
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertEqual(len(comments), 5)
+        self.assertIsNone(comments.next_cursor)
+        self.assertContains(response, 'Комментарий 0')
+        self.assertNotContains(response, '<html')
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTest(BaseTestPost):
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.id})
+
+    def test_not_modified_without_rendering(self):
+        """Повторный запрос с ETag получает 304 за один запрос к базе."""
+        response = self.client.get(self.url)
+        self.assertIn('ETag', response)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_last_modified_for_guests(self):
+        """Гостям отдаётся Last-Modified, пользователям — только ETag."""
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.author_client.force_login(self.author)
+        response = self.author_client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+
+    @run_on_commit()
+    def test_etag_changes(self):
+        """ETag меняется с комментариями и зависит от пользователя."""
+        etag = self.client.get(self.url)['ETag']
+        self.author_client.force_login(self.author)
+        self.assertNotEqual(self.author_client.get(self.url)['ETag'], etag)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @run_on_commit()
+    def test_etag_follows_group(self):
+        """ETag поста меняется при правке его группы."""
+        etag = self.client.get(self.url)['ETag']
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новое название')
+
+    @run_on_commit()
+    def test_author_rename_refreshes_listings(self):
+        """Новое имя автора видно в ленте и группе без ожидания кэша."""
+        urls = (reverse('posts:index'),
+                reverse('posts:group_list', args=[self.group.slug]))
+        for url in urls:
+            self.client.get(url)
+        self.author.first_name = 'Переименованный'
+        self.author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Переименованный')
@@ -4,6 +4,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 import shutil
 from django.conf import settings
 import tempfile
+from unittest import mock
 from ..forms import PostForm
 from ..models import Group, Post
 
@@ -12,6 +13,13 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
+def run_on_commit():
+    """TestCase не фиксирует транзакцию: отложенное сигналами до
+    фиксации (смена версий кэша) выполняется сразу."""
+    return mock.patch('posts.signals.transaction.on_commit',
+                      new=lambda func: func())
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class BaseTestPost(TestCase):
     @classmethod
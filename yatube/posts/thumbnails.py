@@ -0,0 +1,143 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Миниатюры всех размеров, которые используют шаблоны, создаются сразу
+после сохранения поста в пуле потоков, а не при первой отрисовке ленты.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+from .storage import content_addressed_storage
+
+logger = logging.getLogger(__name__)
+
+# Пропорции кадра в ленте и ширины вариантов для srcset.
+THUMBNAIL_RATIO = (960, 339)
+THUMBNAIL_WIDTHS = (480, 768, 960)
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+# WebP отдаётся браузерам, которые его понимают, JPEG — всем остальным.
+THUMBNAIL_FORMATS = {
+    'WEBP': {'format': 'WEBP', 'quality': 75},
+    'JPEG': {'format': 'JPEG', 'quality': 80, 'progressive': True},
+}
+THUMBNAIL_WORKERS = 2
+# Уровней подкаталогов по два символа ключа: при двух уровнях
+# (как в самом sorl) на каталог приходится 1/65536 всех миниатюр.
+THUMBNAIL_SHARD_DEPTH = 2
+
+
+def supported_formats():
+    """Форматы из THUMBNAIL_FORMATS, которые умеет записывать Pillow."""
+    return [
+        name for name in THUMBNAIL_FORMATS
+        if name != 'WEBP' or features.check('webp')
+    ]
+
+
+def geometry(width):
+    ratio_width, ratio_height = THUMBNAIL_RATIO
+    return f'{width}x{round(width * ratio_height / ratio_width)}'
+
+
+def variants():
+    """Пары (формат, ширина, геометрия, опции) всех вариантов картинки."""
+    for name in supported_formats():
+        for width in THUMBNAIL_WIDTHS:
+            yield name, width, geometry(width), {
+                **THUMBNAIL_OPTIONS, **THUMBNAIL_FORMATS[name]}
+
+
+THUMBNAIL_GEOMETRIES = tuple(
+    (size, options) for _, _, size, options in variants())
+
+
+class ShardedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl с настраиваемой глубиной каталогов media/cache.
+
+    Глубина задаётся ``settings.THUMBNAIL_SHARD_DEPTH``; при миллионах
+    миниатюр лишний уровень держит каталоги маленькими.
+    """
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        key = tokey(source.key, geometry_string, serialize(options))
+        depth = getattr(settings, 'THUMBNAIL_SHARD_DEPTH',
+                        THUMBNAIL_SHARD_DEPTH)
+        shards = [key[start:start + 2] for start in range(0, depth * 2, 2)]
+        path = '/'.join([*shards, key])
+        extension = EXTENSIONS[options['format']]
+        return f'{sorl_settings.THUMBNAIL_PREFIX}{path}.{extension}'
+
+    def thumbnail_name(self, file_, geometry_string, **options):
+        """Имя миниатюры, которое выбрал бы get_thumbnail, без её создания."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def generate(name):
+    """Создать все миниатюры картинки; возвращает их число."""
+    # Ключ миниатюры в sorl зависит и от хранилища исходника, поэтому
+    # оно должно совпадать с хранилищем поля Post.image.
+    source = ImageFile(name, content_addressed_storage)
+    for geometry, options in THUMBNAIL_GEOMETRIES:
+        get_thumbnail(source, geometry, **options)
+    return len(THUMBNAIL_GEOMETRIES)
+
+
+def generate_many(names):
+    created = 0
+    for name in names:
+        try:
+            created += generate(name)
+        except Exception:
+            logger.exception('Не удалось создать миниатюры %s', name)
+    return created
+
+
+def _generate_in_background(name):
+    try:
+        generate_many([name])
+    finally:
+        # У каждого потока пула своё соединение с базой.
+        connection.close()
+
+
+def schedule(name):
+    """Поставить картинку в очередь на создание миниатюр.
+
+    При ``THUMBNAIL_BACKGROUND = False`` миниатюры строятся сразу.
+    """
+    global _executor
+    if not settings.THUMBNAIL_BACKGROUND:
+        generate_many([name])
+        return None
+    # Без блокировки первые одновременные вызовы создали бы по пулу,
+    # и потоки всех пулов, кроме последнего, остались бы висеть.
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor.submit(_generate_in_background, name)
@@ -0,0 +1,167 @@
+"""Лента избранных авторов с раздачей постов при записи (fan-out).
+
+Новый пост сразу попадает в ``TimelineEntry`` каждого подписчика,
+поэтому страница ленты — это ``per_page + 1`` записей из индекса
+``(user, -pub_date, -post)``. Авторы с числом подписчиков больше
+``FANOUT_LIMIT`` не раздаются: столько же их последних постов читается
+при показе и сливается с записями ленты.
+"""
+from django.db import connection, transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import Follow, Post, TimelineEntry, User, UserCounters
+from .paginator import PREVIOUS, CursorPaginator
+
+TIMELINE_LENGTH = 1000
+# Насколько лента может перерасти TIMELINE_LENGTH, прежде чем раздача
+# её обрежет: иначе каждый пост удалял бы по строке в каждой ленте.
+TRIM_SLACK = 100
+FANOUT_LIMIT = 5000
+
+
+def followers_count(author_id):
+    return UserCounters.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+
+
+def fan_out(post):
+    """Разослать новый пост в ленты подписчиков автора."""
+    if followers_count(post.author_id) > FANOUT_LIMIT:
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        ignore_conflicts=True,
+    )
+    trim(followers, TRIM_SLACK)
+
+
+def backfill(user, author):
+    """Добавить в ленту последние посты автора после подписки."""
+    posts = Post.objects.filter(author=author).values_list(
+        'id', 'pub_date')[:TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user=user, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        ignore_conflicts=True,
+    )
+    trim([user.pk])
+
+
+def remove(user, author):
+    """Убрать из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def trim(users, slack=0):
+    """Оставить в лентах users TIMELINE_LENGTH свежих записей.
+
+    Обрезаются только ленты длиннее TIMELINE_LENGTH + slack. Их границы
+    (запись номер TIMELINE_LENGTH + 1) находятся одним запросом, по
+    разу на пользователя, а удаление идёт простым сравнением с границей.
+    """
+    entries = TimelineEntry.objects.filter(user=OuterRef('pk'))
+    ordered = entries.order_by('-pub_date', '-post_id')
+    cutoff = ordered[TIMELINE_LENGTH:TIMELINE_LENGTH + 1]
+    cutoffs = User.objects.filter(pk__in=users).annotate(
+        overflow=Subquery(entries.values('post_id')[
+            TIMELINE_LENGTH + slack:TIMELINE_LENGTH + slack + 1]),
+    ).filter(overflow__isnull=False).annotate(
+        cutoff_date=Subquery(cutoff.values('pub_date')),
+        cutoff_post=Subquery(cutoff.values('post_id')),
+    ).values_list('pk', 'cutoff_date', 'cutoff_post')
+    for user_id, cutoff_date, cutoff_post in list(cutoffs):
+        TimelineEntry.objects.filter(
+            Q(pub_date__lt=cutoff_date)
+            | Q(pub_date=cutoff_date, post_id__lte=cutoff_post),
+            user_id=user_id,
+        ).delete()
+
+
+@transaction.atomic
+def rebuild(user_id):
+    """Собрать ленту заново по подпискам (после массовой загрузки).
+
+    Записи вставляются одним INSERT ... SELECT, без создания моделей:
+    лента — это до TIMELINE_LENGTH строк на пользователя.
+    """
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).exclude(
+        author__in=popular_authors(user_id)).values('author')
+    posts = Post.objects.filter(author__in=authors).order_by(
+        '-pub_date', '-id').values_list('id', 'pub_date')[:TIMELINE_LENGTH]
+    sql, params = posts.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TimelineEntry._meta.db_table} '
+            f'(user_id, post_id, pub_date) SELECT %s, * FROM ({sql})',
+            [user_id, *params])
+
+
+def popular_authors(user):
+    """Авторы из подписок user, чьи посты не раздаются при записи."""
+    return Follow.objects.filter(
+        user=user,
+        author__counters__followers_count__gt=FANOUT_LIMIT,
+    ).values('author')
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента избранных user по курсору, без номеров страниц.
+
+    Страница собирается из выборок по ``per_page + 1`` строк: записей
+    ``TimelineEntry`` и постов каждого популярного автора, — все идут по
+    индексу от курсора. Сами посты (``object_list``) читаются по
+    первичному ключу и упорядочиваются уже в Python.
+    """
+    # post_id, а не post: сортировка по связи добавила бы JOIN с постами.
+    entry_ordering = ('-pub_date', '-post_id')
+
+    def __init__(self, object_list, per_page, user, **kwargs):
+        self.user = user
+        super().__init__(object_list, per_page, **kwargs)
+
+    def get_page(self, number, cursor=None):
+        return super().get_page(None, cursor)
+
+    def entries(self, direction, values):
+        """Номера постов из записей ленты после курсора."""
+        return self._seek_queryset(
+            TimelineEntry.objects.filter(user=self.user),
+            self.entry_ordering, direction, values).values('post_id')
+
+    def author_posts(self, author_id, direction, values):
+        """Номера постов автора после курсора."""
+        return self._seek_queryset(
+            Post.objects.filter(author=author_id),
+            self.ordering, direction, values).values('id')
+
+    def _seek_queryset(self, queryset, ordering, direction, values):
+        backwards = direction == PREVIOUS
+        if values:
+            queryset = queryset.filter(
+                self._seek(values, backwards, ordering))
+        queryset = queryset.order_by(*ordering)
+        if backwards:
+            queryset = queryset.reverse()
+        return queryset[:self.per_page + 1]
+
+    def _cursor_queryset(self, direction, values):
+        # Свой подзапрос на каждого автора: общий author IN (...)
+        # сортировал бы все их посты во временном B-дереве.
+        condition = Q(pk__in=self.entries(direction, values))
+        for author_id in popular_authors(self.user).values_list(
+                'author', flat=True):
+            condition |= Q(
+                pk__in=self.author_posts(author_id, direction, values))
+        # Без ORDER BY планировщик не пойдёт по индексу даты через всю
+        # таблицу, а прочитает найденные посты по первичному ключу.
+        posts = self.object_list.order_by().filter(condition)
+        names = self._field_names()
+        return sorted(
+            posts,
+            key=lambda post: [self._value(post, name) for name in names],
+            reverse=direction != PREVIOUS,
+        )[:self.per_page + 1]
@@ -2,7 +2,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path
 
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
@@ -11,6 +11,18 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments,
+        name='comments'
+    ),
+    path('search/', views.search, name='search'),
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path(
+        'sitemap-<slug:section>-<int:number>.xml',
+        views.sitemap,
+        name='sitemap_section'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -29,6 +41,35 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path('api/profile/<str:username>/', api.profile, name='api_profile'),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.comments,
+        name='api_comments'
+    ),
+    path('api/export/posts/', api.export_posts, name='api_export_posts'),
+    path('feeds/posts/rss/', feeds.index_rss, name='index_rss'),
+    path('feeds/posts/atom/', feeds.index_atom, name='index_atom'),
+    path('feeds/group/<slug:slug>/rss/', feeds.group_rss, name='group_rss'),
+    path(
+        'feeds/group/<slug:slug>/atom/',
+        feeds.group_atom,
+        name='group_atom'
+    ),
+    path(
+        'feeds/profile/<str:username>/rss/',
+        feeds.profile_rss,
+        name='profile_rss'
+    ),
+    path(
+        'feeds/profile/<str:username>/atom/',
+        feeds.profile_atom,
+        name='profile_atom'
+    ),
 ]
 if settings.DEBUG:
     urlpatterns += static(
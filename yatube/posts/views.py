@@ -1,74 +1,167 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
+from .cache import conditional_page, feed_key
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+from .paginator import CursorPaginator, InvalidCursor
+from .search import SearchResults
+from .timeline import TimelinePaginator
 
 POST_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+
+
+def paginate(request, queryset, *scopes):
+    paginator = CursorPaginator(queryset, POST_ON_PAGE, scopes=scopes)
+    return paginator.get_page(request.GET.get('page'),
+                              request.GET.get('cursor'))
+
+
+def paginate_comments(request, post_id):
+    paginator = CursorPaginator(
+        Comment.objects.filter(post=post_id).select_related('author'),
+        COMMENTS_ON_PAGE,
+        ordering=('-created', '-id'),
+    )
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            return paginator.cursor_page(cursor)
+        except InvalidCursor:
+            pass
+    return paginator.first_page()
+
+
+def group_page_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return None if group_id is None else [f'group:{group_id}']
+
+
+def profile_page_scopes(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return None if author_id is None else [f'profile:{author_id}']
+
+
+def post_page_scopes(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is None:
+        return None
+    author_id, group_id = post
+    scopes = [f'post:{post_id}', f'profile:{author_id}']
+    if group_id is not None:
+        scopes.append(f'group:{group_id}')
+    return scopes
 
 
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POST_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, post_list, 'index')
     context = {
         'page_obj': page_obj,
+        'feed_key': feed_key(request, 'index'),
         'index': True
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_page_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group)
-    paginator = Paginator(posts, POST_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = paginate(request, posts, f'group:{group.pk}')
     context = {
         'group': group,
-        'posts': posts,
         'page_obj': page_obj,
+        'feed_key': feed_key(request, f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_page_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(User.objects.select_related('counters'),
+                               username=username)
     user = request.user
-    posts = Post.objects.filter(author=author)
-    paginator = Paginator(posts, POST_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = author.posts.select_related('author', 'group')
+    page_obj = paginate(request, posts, f'profile:{author.pk}')
     following = (user.is_authenticated
                  and Follow.objects.filter(user=user, author=author).exists())
     context = {
         'author': author,
         'page_obj': page_obj,
+        'feed_key': feed_key(request, f'profile:{author.pk}'),
         'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page(post_page_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id)
     group = post.group
     author = post.author
     form = CommentForm()
-    posts = Post.objects.filter(author=author)
-    comments = post.comments.all()
+    comments = paginate_comments(request, post.pk)
     context = {
         'post': post,
         'group': group,
         'author': author,
         'comments': comments,
+        'comments_key': feed_key(request, f'post:{post.pk}'),
         'form': form,
-        'posts': posts,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comments(request, post_id):
+    """Следующая порция комментариев поста в виде HTML-фрагмента"""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post_id': post.pk,
+        'comments': paginate_comments(request, post.pk),
+        'comments_key': feed_key(request, f'post:{post.pk}'),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def search(request):
+    """Поиск постов по тексту и названию группы"""
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(SearchResults(query), POST_ON_PAGE)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def sitemap_name(section, number):
+    return f'sitemap-{section}-{number}.xml'
+
+
+def sitemap(request, section=None, number=None):
+    """Готовый файл карты сайта из SITEMAP_ROOT (build_sitemaps)"""
+    name = 'sitemap.xml'
+    if section is not None:
+        name = sitemap_name(section, number)
+    try:
+        content = open(os.path.join(settings.SITEMAP_ROOT, name), 'rb')
+    except FileNotFoundError:
+        raise Http404('Карта сайта ещё не построена.')
+    return FileResponse(content, content_type='application/xml')
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None)
@@ -118,12 +211,14 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, POST_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = TimelinePaginator(
+        Post.objects.select_related('author', 'group'), POST_ON_PAGE,
+        request.user)
+    page_obj = paginator.get_page(None, request.GET.get('cursor'))
     context = {
         'page_obj': page_obj,
+        'feed_key': feed_key(request, 'index',
+                             f'follow:{request.user.pk}'),
         'follow': True
     }
     return render(request, 'posts/follow.html', context)
@@ -20,12 +20,39 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Файлы карты сайта пишет команда build_sitemaps (по расписанию).
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+SITEMAP_BASE_URL = 'http://localhost:8000'
+
+# Общий для воркеров файловый кэш, перед ним LRU каждого процесса
+# (core.cache.TwoTierCache). В продакшене SHARED можно заменить на
+# memcached или redis.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED': {
+                'BACKEND': 'core.cache.FileBasedCache',
+                'LOCATION': os.path.join(BASE_DIR, 'django_cache'),
+                # Здесь и KV-хранилище sorl, и карточки, фрагменты,
+                # страницы лент: 300 записей по умолчанию не хватает.
+                'OPTIONS': {'MAX_ENTRIES': 100000},
+            },
+            'LOCAL_MAX_BYTES': 16 * 1024 * 1024,
+        },
     }
 }
 
+# Токен для сбора /metrics/ (заголовок Authorization: Bearer <токен>);
+# без него метрики видят только сотрудники.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.ShardedThumbnailBackend'
+THUMBNAIL_SHARD_DEPTH = 3
+# Миниатюры новых картинок строятся в пуле потоков после коммита.
+THUMBNAIL_BACKGROUND = True
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -48,6 +75,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,7 +90,7 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,13 +108,44 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# PRAGMA соединений задаются в core.signals. Соединение живёт между
+# запросами CONN_MAX_AGE секунд; timeout — сколько писатель ждёт
+# блокировку другого писателя.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 20,
+        },
     }
 }
 
+# Реплика для чтения: файл поддерживает команда replicate (копия
+# основной базы через backup API SQLite). Пока файла нет, всё читается
+# из default. В тестах реплика — зеркало default (settings_test).
+REPLICA_PATH = os.path.join(BASE_DIR, 'db.replica.sqlite3')
+REPLICA_DATABASES = []
+if os.path.exists(REPLICA_PATH):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': REPLICA_PATH,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append('replica')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Представления, которые только читают и могут читать с реплики.
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+)
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_STICKY_SECONDS = 10
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
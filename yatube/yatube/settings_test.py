@@ -0,0 +1,21 @@
+"""Настройки для тестов: manage.py test и pytest.
+
+Тесты не должны видеть файловый кэш разработки и прошлых прогонов,
+а фоновые потоки миниатюр — писать в MEDIA_ROOT, который тест уже
+удаляет.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES
+
+CACHES['default']['OPTIONS']['SHARED'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}
+THUMBNAIL_BACKGROUND = False
+# Реплика в тестах — зеркало default. Читают с неё только тесты
+# роутера, включая REPLICA_DATABASES: данные зеркала видны лишь вне
+# транзакции теста (TransactionTestCase, transaction=True).
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'MIRROR': 'default'},
+}
+REPLICA_DATABASES = []
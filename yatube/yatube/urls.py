@@ -1,12 +1,15 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics
+
 urlpatterns = [
     path('auth/', include('users.urls')),
     path('', include('posts.urls')),
     path('admin/', admin.site.urls),
     path('auth/', include('django.contrib.auth.urls')),
-    path('about/', include('about.urls', namespace='about'))
+    path('about/', include('about.urls', namespace='about')),
+    path('metrics/', metrics, name='metrics'),
 ]
 handler403 = 'core.views.csrf_failure'
 handler404 = 'core.views.page_not_found'